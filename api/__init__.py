@@ -0,0 +1,2 @@
+#!/usr/bin/python3
+"""The HTTP API of the application"""
@@ -0,0 +1,2 @@
+#!/usr/bin/python3
+"""Version 1 of the HTTP API"""
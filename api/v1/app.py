@@ -0,0 +1,437 @@
+#!/usr/bin/python3
+"""
+Module: app.py
+
+A read-only HTTP API over the storage, served with asyncio and the
+standard library only.
+
+Routes, all answering GET and HEAD requests with JSON:
+
+    /api/v1/status              {"status": "OK"}
+    /api/v1/stats               the number of objects of every class
+    /api/v1/<class>             the objects of a class, see below
+    /api/v1/<class>/count       {"count": <number of those objects>}
+    /api/v1/<class>/<id>        one object
+
+The objects of a class can be narrowed with query parameters:
+
+    <attribute>=<value>         the attribute equals value
+    <attribute>=<low>..<high>   a range of a sorted attribute, see
+                                `FileStorage.select()`
+    order_by=[-]<attribute>     the order, by a sorted attribute
+    q=<words>                   a full-text search, best match first,
+                                see `FileStorage.search()`
+    offset=<n>&limit=<n>        a page of the objects
+
+Connections are kept alive between requests. Before each request the
+storage folds in what other processes saved (see `FileStorage.refresh()`)
+and answers are kept in an LRU cache until the storage changes. Every
+answer has an ETag, made from the ids and `updated_at` of the objects
+it holds, and a request whose If-None-Match matches it gets an empty
+304 answer.
+
+Usage:
+
+    $ python3 -m api.v1.app [--host HOST] [--port PORT]
+
+HBNB_API_HOST (default 0.0.0.0) and HBNB_API_PORT (default 5000) set
+the defaults of both options.
+"""
+import argparse
+import asyncio
+import collections
+import hashlib
+import itertools
+import json
+import os
+import sys
+import traceback
+from urllib.parse import parse_qsl, unquote, urlsplit
+from models import storage, timestamps
+from models.base_model import classes
+from models.engine.ranges import parse_range
+
+try:
+    import resource
+except ImportError:
+    # No file descriptor limits to raise on this platform
+    resource = None
+
+PREFIX = "/api/v1/"
+# Seconds an idle connection is kept open
+IDLE_TIMEOUT = 30
+# Largest request line and headers, in bytes
+MAX_HEAD = 16 * 1024
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request",
+           404: "Not Found", 405: "Method Not Allowed",
+           431: "Request Header Fields Too Large",
+           500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """An error answered with a status and a JSON message"""
+
+    def __init__(self, status, message):
+        """Records the status and the message of the error"""
+        super().__init__(message)
+        self.status = status
+
+
+class Cache:
+    """The latest answers, forgotten as soon as the storage changes
+
+    Entries are (etag, body) pairs keyed by request target, and the
+    least recently used ones are dropped first once there are more than
+    max_entries of them or their bodies take more than max_bytes.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        """Creates an empty cache"""
+        self.entries = collections.OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, target, generation):
+        """Returns the entry of target, or None
+
+        Args:
+            target: the request target.
+            generation: the current `FileStorage.generation()`, every
+                entry is dropped when it changed.
+        """
+        if generation != self.generation:
+            self.entries.clear()
+            self.size = 0
+            self.generation = generation
+        entry = self.entries.get(target)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(target)
+        self.hits += 1
+        return entry
+
+    def put(self, target, etag, body):
+        """Keeps the answer to target"""
+        if len(body) > self.max_bytes:
+            return
+        old = self.entries.pop(target, None)
+        if old is not None:
+            self.size -= len(old[1])
+        self.entries[target] = (etag, body)
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or \
+                self.size > self.max_bytes:
+            _, (_, body) = self.entries.popitem(last=False)
+            self.size -= len(body)
+
+
+class Server:
+    """Answers the HTTP requests of every connection"""
+
+    def __init__(self, cache=None):
+        """Creates a server answering from storage through cache"""
+        self.cache = Cache() if cache is None else cache
+
+    async def handle(self, reader, writer):
+        """Serves the requests of one connection until it is closed"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    writer.write(self.error(431, "headers too large",
+                                            False))
+                    return
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    return
+                keep_alive = False
+                try:
+                    method, target, headers, keep_alive = self.parse(head)
+                    length = headers.get("content-length", "0")
+                    if not length.isdigit() or int(length) > MAX_HEAD:
+                        keep_alive = False
+                        raise HTTPError(400, "unexpected request body")
+                    # Read requests have no use for a body
+                    await reader.readexactly(int(length))
+                    response = self.answer(method, target, headers,
+                                           keep_alive)
+                except HTTPError as error:
+                    response = self.error(error.status, str(error),
+                                          keep_alive)
+                except Exception:
+                    # A bug, the state of the connection is unknown
+                    traceback.print_exc()
+                    keep_alive = False
+                    response = self.error(500, "internal error", False)
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+    @staticmethod
+    def parse(head):
+        """Returns the method, target, headers and keep-alive of a head"""
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+        if not version.startswith("HTTP/1."):
+            raise HTTPError(400, "unsupported version")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            keep_alive = connection == "keep-alive"
+        else:
+            keep_alive = connection != "close"
+        return method, target, headers, keep_alive
+
+    def answer(self, method, target, headers, keep_alive):
+        """Returns the bytes of the response to one request"""
+        if method not in ("GET", "HEAD"):
+            raise HTTPError(405, "the API is read-only")
+        storage.refresh()
+        entry = self.cache.get(target, storage.generation())
+        if entry is None:
+            etag, render = self.resolve(target)
+            body = None
+        else:
+            etag, body = entry
+
+        tags = headers.get("if-none-match")
+        if tags is not None and (tags.strip() == "*" or etag in [
+                tag.strip().replace("W/", "", 1)
+                for tag in tags.split(",")]):
+            return self.response(304, b"", etag, keep_alive, False)
+        if body is None:
+            body = render()
+            self.cache.put(target, etag, body)
+        return self.response(200, body, etag, keep_alive, method == "GET")
+
+    def resolve(self, target):
+        """Returns the ETag of the answer to target and a function
+        returning its body"""
+        url = urlsplit(target)
+        path = unquote(url.path)
+        if not path.startswith(PREFIX):
+            raise HTTPError(404, "not found")
+        parts = path[len(PREFIX):].strip("/").split("/")
+        params = parse_qsl(url.query, keep_blank_values=True)
+
+        if parts == ["status"]:
+            return self.document({"status": "OK"})
+        if parts == ["stats"]:
+            return self.document({name: storage.count(name)
+                                  for name in sorted(classes)})
+        if parts[0] not in classes:
+            raise HTTPError(404, "class doesn't exist")
+        if len(parts) == 1:
+            return self.objects(self.query(parts[0], params))
+        if len(parts) == 2 and parts[1] == "count":
+            if not params:
+                return self.document({"count": storage.count(parts[0])})
+            return self.document(
+                {"count": len(self.query(parts[0], params))})
+        if len(parts) == 2:
+            obj = storage.get(parts[0], parts[1])
+            if obj is None:
+                raise HTTPError(404, "no instance found")
+            return self.objects([obj], single=True)
+        raise HTTPError(404, "not found")
+
+    @staticmethod
+    def query(class_name, params):
+        """Returns the objects of a class matching the query parameters"""
+        cls = classes[class_name]
+        offset, limit, order_by, words = 0, None, None, None
+        criteria = {}
+        ranges = {}
+        for name, value in params:
+            if name in ("offset", "limit"):
+                if not value.isdigit():
+                    raise HTTPError(400, "{} must be a number".format(name))
+                if name == "offset":
+                    offset = int(value)
+                else:
+                    limit = int(value)
+            elif name == "order_by":
+                order_by = value
+            elif name == "q":
+                words = value
+            elif ".." in value and name in cls.sorted_attributes:
+                try:
+                    ranges[name] = parse_range(value)
+                except ValueError as error:
+                    raise HTTPError(400, str(error)) from None
+            else:
+                criteria[name] = Server.cast(cls, name, value)
+        if order_by is not None and \
+                order_by.lstrip("-") not in cls.sorted_attributes:
+            raise HTTPError(400, "{} is not sorted".format(order_by))
+        if words is not None and not cls.text_attributes:
+            raise HTTPError(400, "{} has no text".format(class_name))
+        if words is not None and order_by is not None:
+            raise HTTPError(400, "search results are ordered by rank")
+        stop = None if limit is None else offset + limit
+
+        try:
+            if words is not None:
+                objects = storage.search(
+                    class_name, words,
+                    None if criteria or ranges else stop).values()
+            elif ranges or order_by is not None:
+                if not criteria:
+                    # The sorted indexes do the paging too
+                    return list(storage.select(class_name, order_by, limit,
+                                               offset, **ranges).values())
+                objects = storage.select(class_name, order_by,
+                                         **ranges).values()
+                ranges = {}
+            elif criteria:
+                objects = storage.filter(class_name, **criteria).values()
+            else:
+                objects = storage.all(class_name).values()
+        except ValueError as error:
+            raise HTTPError(400, str(error)) from None
+
+        def matches(obj):
+            for name, value in criteria.items():
+                if getattr(obj, name, None) != value:
+                    return False
+            for name, (low, high) in ranges.items():
+                value = getattr(obj, name, None)
+                try:
+                    if value is None or \
+                            (low is not None and value < low) or \
+                            (high is not None and value > high):
+                        return False
+                except TypeError:
+                    return False
+            return True
+
+        return list(itertools.islice(filter(matches, objects), offset, stop))
+
+    @staticmethod
+    def cast(cls, name, value):
+        """Returns a query value as the type of the class default"""
+        default = getattr(cls, name, None)
+        if isinstance(default, (int, float)) and \
+                not isinstance(default, bool):
+            try:
+                return type(default)(value)
+            except ValueError:
+                raise HTTPError(400, "{} must be a number".format(
+                    name)) from None
+        return value
+
+    @staticmethod
+    def document(content):
+        """Returns the ETag and body function of a JSON document"""
+        body = json.dumps(content).encode("utf-8")
+        etag = '"{}"'.format(hashlib.blake2b(body, digest_size=16)
+                             .hexdigest())
+        return etag, lambda: body
+
+    @staticmethod
+    def objects(objects, single=False):
+        """Returns the ETag and body function of a list of objects
+
+        The ETag only depends on the ids and `updated_at` of the objects,
+        so it is known without serializing them.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for obj in objects:
+            digest.update("{}.{}@{}\n".format(
+                type(obj).__name__, obj.id,
+                timestamps.dump(getattr(obj, "updated_at", ""))).encode())
+        etag = '"{}"'.format(digest.hexdigest())
+
+        def render():
+            if single:
+                return json.dumps(objects[0].to_dict()).encode("utf-8")
+            return json.dumps([obj.to_dict() for obj in objects]) \
+                .encode("utf-8")
+        return etag, render
+
+    @staticmethod
+    def response(status, body, etag, keep_alive, with_body=True):
+        """Returns the bytes of a response"""
+        lines = ["HTTP/1.1 {} {}".format(status, REASONS[status])]
+        if status != 304:
+            lines.append("Content-Type: application/json")
+            lines.append("Content-Length: {}".format(len(body)))
+        if etag is not None:
+            lines.append("ETag: " + etag)
+            lines.append("Cache-Control: no-cache")
+        lines.append("Connection: " + ("keep-alive" if keep_alive
+                                       else "close"))
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head + body if with_body and status != 304 else head
+
+    def error(self, status, message, keep_alive):
+        """Returns the bytes of an error response"""
+        body = json.dumps({"error": message}).encode("utf-8")
+        return self.response(status, body, None, keep_alive)
+
+
+async def serve(host, port, cache=None):
+    """Serves the API on host:port until cancelled"""
+    server = Server(cache)
+    listener = await asyncio.start_server(server.handle, host, port,
+                                          limit=MAX_HEAD, backlog=4096)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv):
+    """Parses the command line and serves the API"""
+    parser = argparse.ArgumentParser(
+        prog="python3 -m api.v1.app",
+        description="Serves the storage as a read-only JSON API.")
+    parser.add_argument("--host", default=os.getenv("HBNB_API_HOST",
+                                                    "0.0.0.0"))
+    parser.add_argument("--port", type=int,
+                        default=int(os.getenv("HBNB_API_PORT", "5000")))
+    parser.add_argument("--cache-entries", type=int, default=1024,
+                        help="answers kept in the cache")
+    options = parser.parse_args(argv)
+
+    if not hasattr(storage, "refresh") or \
+            not hasattr(storage, "generation"):
+        sys.stderr.write("The API needs a storage with refresh() and "
+                         "generation(), such as FileStorage\n")
+        return 1
+    if resource is not None:
+        # One descriptor per client: allow as many as the system does
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            except (ValueError, OSError):
+                pass
+    sys.stderr.write("Serving on http://{}:{}{}\n".format(
+        options.host, options.port, PREFIX))
+    try:
+        asyncio.run(serve(options.host, options.port,
+                          Cache(options.cache_entries)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""
+Load test of the HTTP API.
+
+Opens many keep-alive connections to a running API server at once and
+has each of them send requests one after the other, cycling through a
+list of paths, then prints the throughput, the latency percentiles and
+the count of every status:
+
+    python3 -m api.v1.app --port 5000 &
+    python3 benchmarks/load_api.py --connections 2000 --requests 50
+
+With --revalidate every connection sends back the ETag it last got for
+a path in If-None-Match, as a browser revalidating its cache would.
+"""
+import argparse
+import asyncio
+import collections
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PATHS = ("/api/v1/status", "/api/v1/stats", "/api/v1/State",
+         "/api/v1/Place?limit=20", "/api/v1/Place/count",
+         "/api/v1/Place?order_by=-price_by_night&limit=10")
+
+
+async def client(host, port, paths, requests, revalidate, results):
+    """Sends requests over one connection, recording every answer"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        results["errors"] += requests
+        return
+    etags = {}
+    try:
+        for number in range(requests):
+            path = paths[number % len(paths)]
+            lines = ["GET {} HTTP/1.1".format(path),
+                     "Host: {}:{}".format(host, port)]
+            if revalidate and path in etags:
+                lines.append("If-None-Match: " + etags[path])
+            started = time.perf_counter()
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = int(head.split(b" ", 2)[1])
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                name = name.strip().lower()
+                if name == b"content-length":
+                    length = int(value)
+                elif name == b"etag":
+                    etags[path] = value.strip().decode()
+            await reader.readexactly(length)
+            results["latencies"].append(time.perf_counter() - started)
+            results["statuses"][status] += 1
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        results["errors"] += 1
+    finally:
+        writer.close()
+
+
+async def run(options):
+    """Runs every client at once and returns their results"""
+    results = {"latencies": [], "statuses": collections.Counter(),
+               "errors": 0}
+    paths = options.paths.split(",") if options.paths else PATHS
+    await asyncio.gather(*(
+        client(options.host, options.port, paths, options.requests,
+               options.revalidate, results)
+        for _ in range(options.connections)))
+    return results
+
+
+def main(argv):
+    """Parses the command line, runs the load test and prints a report"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=1000,
+                        help="concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=20,
+                        help="requests sent over each connection")
+    parser.add_argument("--paths",
+                        help="comma-separated paths to request in turn")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="send If-None-Match with the last ETag")
+    options = parser.parse_args(argv)
+
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            except (ValueError, OSError):
+                pass
+
+    started = time.perf_counter()
+    results = asyncio.run(run(options))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results["latencies"])
+    if not latencies:
+        print("no answers, {} errors".format(results["errors"]))
+        return 1
+
+    def percentile(share):
+        return latencies[min(len(latencies) - 1, int(share * len(latencies)))]
+
+    print("{} connections, {} answers in {:.2f}s: {:.0f} requests/s".format(
+        options.connections, len(latencies), elapsed,
+        len(latencies) / elapsed))
+    print("latency ms: p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        percentile(0.50) * 1e3, percentile(0.95) * 1e3,
+        percentile(0.99) * 1e3, latencies[-1] * 1e3))
+    print("statuses: {}  errors: {}".format(
+        ", ".join("{} x{}".format(status, count) for status, count
+                  in sorted(results["statuses"].items())),
+        results["errors"]))
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
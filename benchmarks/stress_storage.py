@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""
+Stress test of the shared FileStorage mode.
+
+Hammers one scratch file from several threads and then from several
+processes, each creating and saving objects, and checks that no save
+was lost. Run it from the repository root:
+
+    python3 benchmarks/stress_storage.py [workers] [saves per worker]
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.environ["HBNB_STORAGE_SHARED"] = "1"
+os.chdir(tempfile.mkdtemp())
+
+from models import storage  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def work(saves):
+    """Creates and saves the given number of users"""
+    for _ in range(saves):
+        User().save()
+
+
+def work_in_process(saves):
+    """Body of a worker process, starting from what is on disk"""
+    storage.reload()
+    work(saves)
+
+
+def stored():
+    """Returns the number of objects in the scratch file"""
+    # Fold in any journal first, along with what other processes saved
+    storage.compact()
+    with open("file.json") as file:
+        return len(json.load(file))
+
+
+def run(name, start, workers, saves):
+    """Times one round of workers and checks the file afterwards"""
+    before = stored()
+    began = time.perf_counter()
+    start(workers, saves)
+    elapsed = time.perf_counter() - began
+    found = stored() - before
+    print("{}: {} workers x {} saves in {:.2f}s ({:.0f} saves/s), "
+          "{}/{} objects stored".format(
+              name, workers, saves, elapsed, workers * saves / elapsed,
+              found, workers * saves))
+    return found == workers * saves
+
+
+def threads(workers, saves):
+    """Runs the workers as threads of this process"""
+    pool = [threading.Thread(target=work, args=(saves,))
+            for _ in range(workers)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def processes(workers, saves):
+    """Runs the workers as separate processes"""
+    with multiprocessing.Pool(workers) as pool:
+        pool.map(work_in_process, [saves] * workers)
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    saves = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ok = run("threads", threads, workers, saves)
+    ok = run("processes", processes, workers, saves) and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+"""
+Benchmark suite of the storage and console hot paths.
+
+For every dataset size a synthetic `file.json` spread over all the model
+classes is generated in a scratch directory, and a fresh process times:
+
+    startup     `import models`, which reloads the file
+    reload      `storage.reload()`
+    first save  the first `storage.save()` after a reload, which has no
+                cached serialization to reuse
+    save        `storage.save()` after changing one object
+    all         going through `storage.all()` and `storage.all(Review)`
+    console     the `create`, `show`, `update`, `all State` and
+                `count Place` commands
+
+Each operation reports its throughput and latency percentiles, and each
+size the peak memory of its process. Results can be stored as a named
+baseline and later runs compared against it:
+
+    python3 benchmarks/suite.py --sizes 1000,100000 --save before
+    python3 benchmarks/suite.py --sizes 1000,100000 --compare before
+
+Baselines live in benchmarks/baselines/, one JSON file per name.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(ROOT, "benchmarks", "baselines")
+# Share of every class in a dataset
+MIX = (("User", 0.10), ("State", 0.02), ("City", 0.08), ("Amenity", 0.05),
+       ("Place", 0.30), ("Review", 0.45))
+
+
+def generate(size, path):
+    """Writes a file.json of about size objects with valid foreign keys"""
+    random.seed(size)
+    stamp = "2024-06-30T09:39:38.071064"
+    records = {}
+    ids = {}
+    for name, share in MIX:
+        ids[name] = [str(uuid.UUID(int=random.getrandbits(128)))
+                     for _ in range(max(1, int(size * share)))]
+    for name, _ in MIX:
+        for id in ids[name]:
+            record = {"id": id, "created_at": stamp, "updated_at": stamp}
+            if name == "User":
+                record.update(email=id[:8] + "@hbnb.io", first_name="Betty")
+            elif name == "City":
+                record.update(state_id=random.choice(ids["State"]),
+                              name="City " + id[:4])
+            elif name == "Place":
+                record.update(city_id=random.choice(ids["City"]),
+                              user_id=random.choice(ids["User"]),
+                              name="Place " + id[:4], number_rooms=3,
+                              latitude=random.uniform(-90, 90),
+                              longitude=random.uniform(-180, 180))
+            elif name == "Review":
+                record.update(place_id=random.choice(ids["Place"]),
+                              user_id=random.choice(ids["User"]),
+                              text="Great stay " * 5)
+            else:
+                record.update(name=name + " " + id[:4])
+            record["__class__"] = name
+            records["{}.{}".format(name, id)] = record
+    with open(path, "w") as file:
+        json.dump(records, file, indent=4)
+    return ids
+
+
+def timed(function, runs):
+    """Returns the duration in seconds of each of runs calls of function"""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def summary(durations):
+    """Returns the throughput and latency percentiles of durations"""
+    ordered = sorted(durations)
+
+    def percentile(share):
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    total = sum(ordered)
+    return {"runs": len(ordered),
+            "per_second": len(ordered) / total if total else 0.0,
+            "p50": percentile(0.50), "p95": percentile(0.95),
+            "p99": percentile(0.99)}
+
+
+def measure(size):
+    """Runs every benchmark of one dataset size in this process
+
+    The process must have been started in a directory holding the
+    generated file.json, see `run()`.
+    """
+    runs = max(3, min(200, 200000 // size))
+    results = {}
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import models
+    results["startup"] = summary([time.perf_counter() - started])
+
+    from console import HBNBCommand
+    from models.review import Review
+    storage = models.storage
+    results["reload"] = summary(timed(storage.reload, max(1, runs // 10)))
+
+    user = next(iter(storage.all("User").values()))
+
+    def save():
+        user.first_name = "Betty"
+        storage.save()
+
+    def iterate(cls=None):
+        for _ in storage.all(cls).values():
+            pass
+
+    results["first save"] = summary(timed(save, 1))
+    results["save"] = summary(timed(save, runs))
+    results["all"] = summary(timed(iterate, runs))
+    results["all(Review)"] = summary(timed(lambda: iterate(Review), runs))
+
+    console = HBNBCommand(stdout=io.StringIO())
+    output = io.StringIO()
+    real_stdout = sys.stdout
+    sys.stdout = output
+    try:
+        commands = {
+            "create": "create User",
+            "show": "show User " + user.id,
+            "update": 'update User {} last_name "Holberton"'.format(user.id),
+            "all State": "all State",
+            "count Place": "count Place",
+        }
+        for name, line in commands.items():
+            results[name] = summary(timed(
+                lambda: (console.onecmd(line), output.truncate(0),
+                         output.seek(0)), runs))
+    finally:
+        sys.stdout = real_stdout
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"operations": results, "peak_rss_kb": peak}
+
+
+def run(size):
+    """Generates a dataset and measures it in a fresh process"""
+    with tempfile.TemporaryDirectory() as directory:
+        generate(size, os.path.join(directory, "file.json"))
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        for name in list(env):
+            # Benchmark the default storage settings
+            if name.startswith("HBNB_"):
+                del env[name]
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__),
+             "--measure", str(size)],
+            cwd=directory, env=env, check=True, stdout=subprocess.PIPE)
+    return json.loads(process.stdout)
+
+
+def report(results, baseline=None, threshold=0.2):
+    """Prints results, next to the baseline if any
+
+    Returns:
+        the number of operations whose median latency regressed by more
+        than threshold compared to the baseline.
+    """
+    regressions = 0
+    for size, result in results.items():
+        print("{} objects, peak memory {:.1f} MiB".format(
+            size, result["peak_rss_kb"] / 1024))
+        print("  {:<12} {:>6} {:>12} {:>10} {:>10} {:>10}  {}".format(
+            "operation", "runs", "ops/s", "p50 ms", "p95 ms", "p99 ms",
+            "p50 vs baseline"))
+        before = (baseline or {}).get(size, {}).get("operations", {})
+        for name, stats in result["operations"].items():
+            change = ""
+            if name in before and before[name]["p50"]:
+                ratio = stats["p50"] / before[name]["p50"] - 1
+                change = "{:+.0%}".format(ratio)
+                if ratio > threshold:
+                    change += " REGRESSION"
+                    regressions += 1
+            print("  {:<12} {:>6} {:>12.1f} {:>10.3f} {:>10.3f} {:>10.3f}"
+                  "  {}".format(name, stats["runs"], stats["per_second"],
+                                stats["p50"] * 1e3, stats["p95"] * 1e3,
+                                stats["p99"] * 1e3, change))
+    return regressions
+
+
+def main(argv):
+    """Parses the command line and runs the suite"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="1000,100000",
+                        help="comma-separated dataset sizes "
+                             "(default: 1000,100000; 1000000 is supported)")
+    parser.add_argument("--save", metavar="NAME",
+                        help="store the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME",
+                        help="compare the results with baseline NAME")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="median slowdown counted as a regression")
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    if options.measure:
+        json.dump(measure(options.measure), sys.stdout)
+        return 0
+
+    results = {}
+    for size in options.sizes.split(","):
+        results[size] = run(int(size))
+
+    baseline = None
+    if options.compare:
+        with open(os.path.join(BASELINES, options.compare + ".json")) as file:
+            baseline = json.load(file)
+    regressions = report(results, baseline, options.threshold)
+
+    if options.save:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(os.path.join(BASELINES, options.save + ".json"),
+                  "w") as file:
+            json.dump(results, file, indent=4)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -24,19 +24,59 @@ Typical usage example:
     (hbnb) quit
     $
 """
+import argparse
+import ast
 import cmd
-from models.base_model import BaseModel
-from models import storage
-from models.engine.file_storage import FileStorage
-from models.user import User
-from models.state import State
-from models.review import Review
-from models.place import Place
-from models.city import City
-from models.amenity import Amenity
-
-class_names = ["BaseModel", "User", "State",
-               "City", "Amenity", "Place", "Review"]
+import itertools
+import json
+import math
+import re
+import sys
+import time
+from models import instrument, storage
+from models.base_model import classes
+from models.engine.ranges import parse_range
+
+# <class>.<method>(<arguments>)
+DOT_COMMAND = re.compile(r"^\s*(\w+)\.(\w+)\((.*)\)\s*$")
+DOT_METHODS = ("all", "show", "destroy", "update", "count", "near",
+               "within", "search")
+# One argument and the comma after it
+DOT_ARGUMENT = re.compile(r"""
+    \s*
+    ( \{.*\}                  # a dictionary literal
+    | "(?:[^"\\]|\\.)*"       # a double-quoted string
+    | '(?:[^'\\]|\\.)*'       # a single-quoted string
+    | [^,"'\s][^,]*?          # a bare word
+    )
+    \s*(,|$)
+""", re.VERBOSE)
+
+
+def parse_arguments(text):
+    """Returns the values of comma-separated arguments, or None
+
+    Quoted strings and dictionary literals are read as Python literals,
+    bare words are kept as they are.
+    """
+    values = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = DOT_ARGUMENT.match(text, position)
+        if match is None:
+            return None
+        token = match.group(1)
+        if token[0] in "{\"'":
+            try:
+                token = ast.literal_eval(token)
+            except (ValueError, SyntaxError):
+                return None
+        values.append(token)
+        position = match.end()
+        if match.group(2) == "" and position < len(text):
+            return None
+    return values
 
 
 class HBNBCommand(cmd.Cmd):
@@ -52,15 +92,20 @@ class HBNBCommand(cmd.Cmd):
     """
     prompt = "(hbnb) "
 
+    def __init__(self, *args, **kwargs):
+        """Starts the console with no command timings"""
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+
     def do_create(self, arg):
         """Creates a new instance of BaseModel"""
         if len(arg) < 1:
             print("** class name missing **")
             return
 
-        elif arg in class_names:
+        elif arg in classes:
             print(arg)
-            class_instance = globals()[arg]()
+            class_instance = classes[arg]()
             class_instance.save()
             print(class_instance.id)
 
@@ -74,7 +119,7 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
             return
 
-        if args[0] not in class_names:
+        if args[0] not in classes:
             print("** class doesn't exist **")
             return
 
@@ -82,10 +127,7 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        obj_intsance = storage.all()
-
-        key = "{}.{}".format(args[0], args[1])
-        requested_instance = obj_intsance.get(key)
+        requested_instance = storage.get(args[0], args[1])
         if not requested_instance:
             print("** no instance found **")
             return
@@ -99,7 +141,7 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
             return
 
-        if args[0] not in class_names:
+        if args[0] not in classes:
             print("** class doesn't exist **")
             return
 
@@ -107,38 +149,178 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        obj_instance = storage.all()
-        key = "{}.{}".format(args[0], args[1])
-
-        requested_instance = obj_instance.get(key)
+        requested_instance = storage.get(args[0], args[1])
         if not requested_instance:
             print("** no instance found **")
             return
-        del storage.all()[key]
+        storage.delete(requested_instance)
         storage.save()
 
     def do_all(self, arg):
         """Prints all string representation of
-        all instances based or not on the class name."""
-        if arg and arg not in class_names:
-            print("** class doesn't exist **")
-            return
+        all instances based or not on the class name.
+        usage: all [<class>] [offset=<n>] [limit=<n>] [jsonl]
+                   [<attribute>=<low>..<high>] [order_by=[-]<attribute>]
+
+        Instances are written one at a time as they are formatted, in
+        the format of a printed list of strings, or with jsonl as one
+        JSON object per line. A range keeps the instances whose value
+        is between low and high, which are numbers or ISO dates and may
+        be left out for an open end, and order_by sorts them, with -
+        for descending order. Both only apply to sorted attributes.
+        """
+        args = arg.split()
+        class_name = None
+        if args and "=" not in args[0] and args[0] != "jsonl":
+            class_name = args.pop(0)
+            if class_name not in classes:
+                print("** class doesn't exist **")
+                return
 
-        obj_instances = storage.all()
-        obj_list = []
+        options = {"offset": 0, "limit": None}
+        lines = False
+        order_by = None
+        ranges = {}
+        for option in args:
+            name, _, value = option.partition("=")
+            if option == "jsonl":
+                lines = True
+            elif name in options and value.isdigit():
+                options[name] = int(value)
+            elif name == "order_by" and value:
+                order_by = value
+            elif ".." in value:
+                try:
+                    ranges[name] = parse_range(value)
+                except ValueError:
+                    print("** value type mismatch **")
+                    return
+            else:
+                print("** invalid option {} **".format(option))
+                return
 
-        # If arg is provided, filter instances by class name
-        if arg:
-            for key, obj in obj_instances.items():
-                if key.startswith(arg + "."):
-                    obj_list.append(str(obj))
-                    
-        # If arg is not provided, add all instances
+        names = list(ranges)
+        if order_by is not None:
+            names.append(order_by.lstrip("-"))
+        if not names:
+            objects = self._matching(class_name, **options)
+        elif class_name is None:
+            print("** class name missing **")
+            return
+        elif not all(name in classes[class_name].sorted_attributes
+                     for name in names):
+            print("** attribute not sorted **")
+            return
+        elif not self._supported("select"):
+            return
         else:
-            for obj in obj_instances.values():
-                obj_list.append(str(obj))
+            try:
+                objects = storage.select(class_name, order_by, **options,
+                                         **ranges).values()
+            except ValueError:
+                print("** value type mismatch **")
+                return
+        self._print_objects(objects, lines)
 
-        print(obj_list)
+    @staticmethod
+    def _print_objects(objects, lines=False):
+        """Prints objects one at a time as a list of strings
+
+        Args:
+            objects: an iterable of instances.
+            lines: print one compact JSON object per line instead.
+        """
+        if lines:
+            for obj in objects:
+                print(json.dumps(obj.to_dict(), separators=(",", ":")))
+            return
+        # Same output as print() of the list of strings, built as we go
+        print("[", end="")
+        separator = ""
+        for obj in objects:
+            print(separator, repr(str(obj)), sep="", end="")
+            separator = ", "
+        print("]")
+
+    def do_near(self, arg):
+        """Prints the instances within a distance of a point, nearest first
+        usage: near <class> <latitude> <longitude> <radius in km>
+        """
+        values = self._spatial_arguments(arg, 3)
+        if values is not None and self._supported("near"):
+            self._print_objects(storage.near(*values).values())
+
+    def do_within(self, arg):
+        """Prints the instances inside a latitude/longitude box
+        usage: within <class> <south> <west> <north> <east>
+        """
+        values = self._spatial_arguments(arg, 4)
+        if values is not None and self._supported("within"):
+            self._print_objects(storage.within(*values).values())
+
+    def do_search(self, arg):
+        """Prints the instances whose text matches a query, best first
+        usage: search <class> <words> [OR <words>]...
+        """
+        args = arg.split(None, 1)
+        if len(args) < 1:
+            print("** class name missing **")
+        elif args[0] not in classes:
+            print("** class doesn't exist **")
+        elif not classes[args[0]].text_attributes:
+            print("** class has no text **")
+        elif len(args) < 2:
+            print("** query missing **")
+        elif self._supported("search"):
+            self._print_objects(storage.search(args[0], args[1]).values())
+
+    @staticmethod
+    def _spatial_arguments(arg, count):
+        """Returns the class name and count numbers of arg, or None"""
+        args = arg.split()
+        if len(args) < 1:
+            print("** class name missing **")
+            return None
+        if args[0] not in classes:
+            print("** class doesn't exist **")
+            return None
+        if not classes[args[0]].spatial_attributes:
+            print("** class has no coordinates **")
+            return None
+        if len(args) != count + 1:
+            print("** {} numbers expected **".format(count))
+            return None
+        try:
+            numbers = [float(value) for value in args[1:]]
+        except ValueError:
+            print("** value type mismatch **")
+            return None
+        if not all(math.isfinite(number) for number in numbers):
+            print("** value type mismatch **")
+            return None
+        return [args[0]] + numbers
+
+    @staticmethod
+    def _supported(method):
+        """Tells if the storage has a query method, printing an error
+        if it does not"""
+        if hasattr(storage, method):
+            return True
+        print("** not supported by this storage **")
+        return False
+
+    @staticmethod
+    def _matching(class_name, offset=0, limit=None):
+        """Yields the instances of a class, or of all classes, in order
+
+        Args:
+            class_name: a class name, or None for every instance.
+            offset: the number of instances to skip first.
+            limit: the largest number of instances to yield.
+        """
+        objects = storage.all(class_name).values()
+        stop = None if limit is None else offset + limit
+        yield from itertools.islice(objects, offset, stop)
 
     def do_update(self, arg):
         """Updates an instance based on the class name
@@ -147,7 +329,7 @@ class HBNBCommand(cmd.Cmd):
         if len(args) < 1:
             print("** class name missing **")
             return
-        if args[0] not in class_names:
+        if args[0] not in classes:
             print("** class doesn't exist **")
             return
         if len(args) == 1:
@@ -164,102 +346,191 @@ class HBNBCommand(cmd.Cmd):
             return
 
         class_name, instance_id, attribute_name, attribute_value = args
-        key = "{}.{}".format(class_name, instance_id)
-        obj_instances = storage.all()
+        self._update(class_name, instance_id,
+                     {attribute_name: attribute_value})
 
-        if key not in obj_instances:
-            print("** no instance found **")
-            return
+    @staticmethod
+    def _update(class_name, instance_id, attributes):
+        """Sets several attributes of an instance and saves it once
 
-        instance = obj_instances[key]
-
-        if attribute_name in ["id", "created_at", "updated_at"]:
-            print("** can't update {} **".format(attribute_name))
+        Nothing is changed unless every attribute can be set.
+        """
+        instance = storage.get(class_name, instance_id)
+        if instance is None:
+            print("** no instance found **")
             return
 
-        # Cast attribute_value to the correct type
-        if hasattr(instance, attribute_name):
-            attr_type = type(getattr(instance, attribute_name))
-            try:
-                if attr_type == int:
-                    attribute_value = int(attribute_value)
-                elif attr_type == float:
-                    attribute_value = float(attribute_value)
-                else:
-                    attribute_value = str(attribute_value)
-            except ValueError:
-                print("** value type mismatch **")
+        values = {}
+        for attribute_name, attribute_value in attributes.items():
+            if not isinstance(attribute_name, str) or \
+                    attribute_name.startswith("_") or \
+                    callable(getattr(type(instance), attribute_name, None)):
+                print("** invalid attribute name {} **".format(
+                    attribute_name))
+                return
+            if attribute_name in ["id", "created_at", "updated_at"]:
+                print("** can't update {} **".format(attribute_name))
                 return
 
-        setattr(instance, attribute_name, attribute_value)
+            # Cast attribute_value to the correct type
+            if hasattr(instance, attribute_name):
+                attr_type = type(getattr(instance, attribute_name))
+                try:
+                    if attr_type == int:
+                        attribute_value = int(attribute_value)
+                    elif attr_type == float:
+                        attribute_value = float(attribute_value)
+                    else:
+                        attribute_value = str(attribute_value)
+                except ValueError:
+                    print("** value type mismatch **")
+                    return
+            values[attribute_name] = attribute_value
+
+        for attribute_name, attribute_value in values.items():
+            setattr(instance, attribute_name, attribute_value)
         instance.save()
-        
+
     def do_count(self, arg):
         """
         Counts and retrieves the number of instances of a class
         usage: <class name>.count()
         """
         arg = arg.split()
-        storage = FileStorage()
-        objs_counter = 0
-        objs = storage.all()
         if len(arg) == 0:
             print("** class name missing **")
+        elif arg[0] not in classes:
+            print("** invalid class name **")
         else:
-            if arg[0] in self.valid_classnames:
-                for key, value in objs.items():
-                    class_name, obj_id = key.split(".")
-                    if arg[0] == class_name:
-                        objs_counter += 1
-            else:
-                print("** invalid class name **")
-            if objs_counter == 0:
-                return
-            print(objs_counter)
+            print(storage.count(arg[0]))
 
     def default(self, arg):
         """
         Default behavior for cmd module when input is not valid
+
+        Handles the <class>.<method>(<arguments>) syntax, where the
+        arguments are separated by commas and are quoted strings, a
+        dictionary literal or bare words, for example:
+            User.update("<id>", {"first_name": "Betty", "age": 89})
         """
-        if "." in arg and "(" in arg and ")" in arg:
-            # Splitting the command into class_name and method
-            arg_list = arg.split('.')
-            class_name = arg_list[0]
-            method = arg_list[1].split("(")[0]
-            
-            method_dict = {
-            "all": self.do_all,
-            "show": self.do_show,
-            "destroy": self.do_destroy,
-            "update": self.do_update,
-            "count": self.do_count
-            }
-            
-            # Check if class_name is valid
-            if class_name not in class_names:
-                print("** class doesn't exist **")
-                return False
-            
-            # Check if method exists in the method_dict
-            if method not in method_dict:
-                print("*** Unknown syntax: {}".format(arg))
-                return False
-            
-            # Extracting arguments within parentheses if any
-            if "(" in arg and ")" in arg:
-                arg_start = arg.index("(") + 1
-                arg_end = arg.index(")")
-                args = arg[arg_start:arg_end].strip()
-            else:
-                args = ""
-            
-            # Call the appropriate method from method_dict
-            return method_dict[method](class_name + " " + args)
-        
-        else:
+        match = DOT_COMMAND.match(arg)
+        if match is None:
             print("*** Unknown syntax: {}".format(arg))
             return False
 
+        class_name, method, arguments = match.groups()
+        # Check if class_name is valid
+        if class_name not in classes:
+            print("** class doesn't exist **")
+            return False
+
+        # Check if method exists in DOT_METHODS
+        if method not in DOT_METHODS:
+            print("*** Unknown syntax: {}".format(arg))
+            return False
+
+        args = parse_arguments(arguments)
+        if args is None:
+            print("*** Unknown syntax: {}".format(arg))
+            return False
+
+        if method == "update" and len(args) > 1:
+            if isinstance(args[1], dict):
+                return self._update(class_name, args[0], args[1])
+            if len(args) == 3:
+                return self._update(class_name, args[0], {args[1]: args[2]})
+
+        # Call the do_<method> command with space-separated arguments
+        words = [class_name] + [str(value) for value in args]
+        return getattr(self, "do_" + method)(" ".join(words))
+
+    def do_batch(self, arg):
+        """Runs the commands of a file and saves once at the end
+        usage: batch <file>
+        """
+        if len(arg) < 1:
+            print("** file name missing **")
+            return
+        try:
+            with open(arg, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            print("** file doesn't exist **")
+            return
+
+        # quit or EOF ends the script, not the console
+        self.run_commands(lines)
+
+    def run_commands(self, lines, checkpoint=0, prompt=""):
+        """Runs lines of commands with their saves deferred
+
+        Changes are saved once at the end, or every checkpoint commands,
+        and the time taken by every command is added to `timings`.
+
+        Args:
+            lines: an iterable of command lines.
+            checkpoint: the number of commands between saves, or 0.
+            prompt: written before each command, as `cmdloop()` does.
+
+        Returns:
+            True if a command ended the console, False when lines ran out.
+        """
+        lines = iter(lines)
+        while True:
+            ran = 0
+            with storage.batch():
+                for line in itertools.islice(lines, checkpoint or None):
+                    ran += 1
+                    self.stdout.write(prompt)
+                    if self.run_command(line.rstrip("\n")):
+                        return True
+            if not checkpoint or ran < checkpoint:
+                return False
+
+    def run_command(self, line):
+        """Runs one command line like `cmdloop()` and times it"""
+        started = time.perf_counter()
+        stop = self.onecmd(self.precmd(line))
+        stop = self.postcmd(stop, line)
+        timing = self.timings.setdefault(self.command_name(line), [0, 0.0])
+        timing[0] += 1
+        timing[1] += time.perf_counter() - started
+        return stop
+
+    def command_name(self, line):
+        """Returns the command a line runs, its method in dot notation"""
+        match = DOT_COMMAND.match(line)
+        if match is not None:
+            return match.group(2)
+        return self.parseline(line)[0] or ""
+
+    def report(self, file):
+        """Writes the number and timing of the commands run to file"""
+        count = sum(timing[0] for timing in self.timings.values())
+        elapsed = sum(timing[1] for timing in self.timings.values())
+        print("{} commands in {:.3f}s ({:.0f} commands/s)".format(
+            count, elapsed, count / elapsed if elapsed else 0), file=file)
+        for name, (runs, total) in sorted(self.timings.items()):
+            print("  {:<10} {:>8} runs {:>10.1f} us/run".format(
+                name or "(empty)", runs, total / runs * 1e6), file=file)
+
+    def do_stats(self, arg):
+        """Prints the time spent in storage, model and console operations
+        usage: stats [on|off|reset]
+        """
+        if arg == "on":
+            instrument.enable()
+        elif arg == "off":
+            instrument.disable()
+        elif arg == "reset":
+            instrument.stats.reset()
+        elif arg:
+            print("** invalid option {} **".format(arg))
+        elif not instrument.enabled():
+            print("** instrumentation is off, use stats on **")
+        else:
+            print(instrument.stats.report())
+
     def do_help(self, arg):
         """To get help on a command, type help <topic>."""
         return super().do_help(arg)
@@ -267,10 +538,12 @@ class HBNBCommand(cmd.Cmd):
     def do_quit(self, arg):
         """Quit command to exit the program
         """
+        storage.close()
         return True
 
     def do_EOF(self, arg):
         """Inbuilt EOF command to calmly catch errors."""
+        storage.close()
         return True
 
     def emptyline(self):
@@ -278,5 +551,58 @@ class HBNBCommand(cmd.Cmd):
         pass
 
 
+instrument.register(
+    HBNBCommand, "onecmd",
+    lambda args: "console." + (args[0].command_name(args[1]) or "(empty)"))
+
+
+def count(text):
+    """Returns the number a command line option gives, which can't be
+    negative"""
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(
+            "{} is not a positive number or 0".format(text))
+    return value
+
+
+def main(argv):
+    """Runs the console, in batch mode when stdin is not a terminal
+
+    Batch mode reads the commands as a stream, defers saving to the end
+    or to every --checkpoint commands and writes exactly what cmdloop()
+    would, prompts included.
+    """
+    parser = argparse.ArgumentParser(description="HolbertonBnB console")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run the commands of FILE ('-' for stdin)")
+    parser.add_argument("--checkpoint", type=count, default=0, metavar="N",
+                        help="save every N commands in batch mode")
+    parser.add_argument("--stats", action="store_true",
+                        help="write command timings to stderr")
+    options = parser.parse_args(argv)
+
+    console = HBNBCommand()
+    if options.batch is None and sys.stdin.isatty():
+        console.cmdloop()
+        return
+
+    source = sys.stdin
+    if options.batch not in (None, "-"):
+        source = open(options.batch, encoding="utf-8")
+    with source:
+        console.preloop()
+        stopped = console.run_commands(source, options.checkpoint,
+                                       console.prompt)
+        if not stopped:
+            # End of input, as cmdloop() handles it
+            console.stdout.write(console.prompt)
+            console.run_command("EOF")
+        console.postloop()
+    if options.stats:
+        console.stdout.flush()
+        console.report(sys.stderr)
+
+
 if __name__ == '__main__':
-    HBNBCommand().cmdloop()
+    main(sys.argv[1:])
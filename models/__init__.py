@@ -2,8 +2,30 @@
 """
 Module: __init__.py
 """
+import os
 
-from models.engine import file_storage
-
-storage = file_storage.FileStorage()
+if os.getenv("HBNB_TYPE_STORAGE") == "sqlite":
+    from models.engine import sqlite_storage
+    storage = sqlite_storage.SQLiteStorage()
+else:
+    from models.engine import file_storage
+    storage = file_storage.FileStorage()
+    if os.getenv("HBNB_STORAGE_JOURNAL"):
+        storage.enable_journal()
+    if os.getenv("HBNB_STORAGE_FORMAT"):
+        storage.set_format(os.getenv("HBNB_STORAGE_FORMAT"))
+    if os.getenv("HBNB_STORAGE_LAZY"):
+        storage.enable_lazy()
+    if os.getenv("HBNB_STORAGE_SHARDED"):
+        storage.enable_sharding()
+    if os.getenv("HBNB_STORAGE_SHARED"):
+        storage.enable_shared()
+    if os.getenv("HBNB_STORAGE_WRITE_BEHIND"):
+        storage.start_writer(float(os.getenv("HBNB_STORAGE_WRITE_BEHIND")))
+if os.getenv("HBNB_INSTRUMENT") or os.getenv("HBNB_TRACE"):
+    from models import instrument
+    if os.getenv("HBNB_TRACE"):
+        instrument.enable(instrument.TraceFile(os.getenv("HBNB_TRACE")))
+    else:
+        instrument.enable()
 storage.reload()
@@ -5,13 +5,16 @@ It defines one class, `Amenity(),
 which sub-classes the `BaseModel()` class.`
 """
 from models.base_model import BaseModel
+from models.compact import compact_model
 
 
+@compact_model
 class Amenity(BaseModel):
     """An amenity provided by a place/house.
 
     Attributes:
         name
     """
+    text_attributes = ("name",)
 
     name = ""
@@ -5,10 +5,39 @@ Model: base_model.py
 import models
 import uuid
 from datetime import datetime
+from models import timestamps
+
+# Model classes by name, every subclass of BaseModel registers itself
+classes = {}
 
 
 class BaseModel:
-    """The base class that the other classes inherit from"""
+    """The base class that the other classes inherit from
+
+    Attributes:
+        indexed_attributes: names of the attributes the storage keeps
+            a lookup index on, see `FileStorage.filter()`.
+        spatial_attributes: names of the latitude and longitude
+            attributes the storage keeps a grid index on, see
+            `FileStorage.near()`.
+        text_attributes: names of the attributes whose words the
+            storage keeps a full-text index on, see
+            `FileStorage.search()`.
+        sorted_attributes: names of the attributes the storage can keep
+            a sorted index on, see `FileStorage.select()`.
+    """
+    indexed_attributes = ()
+    spatial_attributes = ()
+    text_attributes = ()
+    sorted_attributes = ("created_at", "updated_at")
+    created_at = timestamps.Timestamp()
+    updated_at = timestamps.Timestamp()
+
+    def __init_subclass__(cls, **kwargs):
+        """Registers a new model class in `classes` under its name"""
+        super().__init_subclass__(**kwargs)
+        classes[cls.__name__] = cls
+
     def __init__(self, *args, **kwargs):
         """Defines public instance attributes"""
         # Create an instance of BaseModel from a dictionary
@@ -18,10 +47,10 @@ class BaseModel:
                 if key == "__class__":
                     continue
                 elif key == "created_at" or key == "updated_at":
-                    setattr(self, key, datetime.strptime(
-                        value, "%Y-%m-%dT%H:%M:%S.%f"))
+                    # Parsed on first read, see models.timestamps
+                    self._load(key, timestamps.check(value))
                 else:
-                    setattr(self, key, value)
+                    self._load(key, value)
         else:
             self.id = str(uuid.uuid4())
             self.created_at = datetime.now()
@@ -31,26 +60,63 @@ class BaseModel:
             # with classname.id as a Key
             models.storage.new(self)
 
+    def __setattr__(self, name, value):
+        """Sets an attribute and marks the instance as changed"""
+        old = None
+        if name in self.indexed_attributes:
+            old = getattr(self, name, None)
+        super().__setattr__(name, value)
+        models.storage.touch(self, name, old)
+
+    def _load(self, name, value):
+        """Sets an attribute read from a dictionary
+
+        Unlike an assignment it is not reported to the storage, the
+        object is not changed by being rebuilt.
+        """
+        object.__setattr__(self, name, value)
+
     def __str__(self):
         """Returns class name, the id, and available
         attributes as key-value pairs"""
+        attributes = self._attributes()
+        # Show parsed timestamps rather than the strings they came from
+        for name in ("created_at", "updated_at"):
+            if isinstance(attributes.get(name), str):
+                getattr(self, name)
         return "[{}] ({} {})".format(self.__class__.__name__,
-                                     self.id, self.__dict__)
+                                     self.id, attributes)
 
     def save(self):
         """Method to update the time of method instances"""
         self.updated_at = datetime.now()
 
+        # Marks the object as changed since the last save, without
+        # adding it back if it was deleted
+        models.storage.touch(self)
+
         # Serializes the object into a JSON file
         models.storage.save()
 
     def to_dict(self):
         """Method to convert an instaces of the BaseModel
         class to key-value pair dictionaries"""
-        dic_copy = self.__dict__.copy()
+        dic_copy = dict(self._attributes())
         dic_copy["__class__"] = self.__class__.__name__
-        dic_copy["created_at"] = self.created_at.isoformat()
-        dic_copy["updated_at"] = self.updated_at.isoformat()
+        dic_copy["created_at"] = timestamps.dump(dic_copy["created_at"])
+        dic_copy["updated_at"] = timestamps.dump(dic_copy["updated_at"])
 
         # Returns the dictionary
         return dic_copy
+
+    def _attributes(self):
+        """Returns the instance attributes in assignment order"""
+        return self.__dict__
+
+    def _assigned(self, name):
+        """Tells if the instance has its own value of name, rather than
+        the class default"""
+        return name in self.__dict__
+
+
+classes[BaseModel.__name__] = BaseModel
@@ -5,8 +5,10 @@ It defines one class, `City(),
 which sub-classes the `BaseModel()` class.`
 """
 from models.base_model import BaseModel
+from models.compact import compact_model
 
 
+@compact_model
 class City(BaseModel):
     """A city in the application.
 
@@ -14,5 +16,8 @@ class City(BaseModel):
         name
         state_id
     """
+    indexed_attributes = ("state_id",)
+    text_attributes = ("name",)
+
     name = ""
     state_id = ""
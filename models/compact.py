@@ -0,0 +1,285 @@
+#!/usr/bin/python3
+"""The `compact` module
+
+It defines `compact_model()`, the class decorator of the models that
+declare their attributes (`User`, `State`, `City`, `Amenity`, `Place`
+and `Review`).
+
+When HBNB_COMPACT_MODELS is set in the environment, the decorated class
+is replaced by a subclass of the same name whose instances keep their
+id, timestamps and declared attributes in per-class columns instead of
+an instance dictionary:
+
+    - ids are stored as the 16 bytes of the uuid,
+    - timestamps as integer microseconds in an `array`,
+    - declared attributes in one list per attribute.
+
+Each instance only holds its row number and a layout, a tuple of its
+attribute names in assignment order shared by every instance that was
+assigned the same attributes in the same order, so `__str__` and
+`to_dict()` print exactly what the plain model would. Attributes added
+on the fly by `update` go to the instance dictionary as usual.
+"""
+import os
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from models import timestamps
+
+COMPACT = bool(os.getenv("HBNB_COMPACT_MODELS"))
+EPOCH = datetime(1970, 1, 1)
+NO_STAMP = -2 ** 63
+UNSET = object()
+# The bookkeeping of an instance, which no assignment may replace
+SLOTS = ("_row", "_layout")
+
+
+class Table:
+    """The columns holding the instances of one compact model class"""
+
+    def __init__(self, fields):
+        """Creates empty columns for the id, timestamps and fields"""
+        self.flags = bytearray()
+        self.ids = bytearray()
+        self.odd_ids = {}
+        self.stamps = {"created_at": array('q'), "updated_at": array('q')}
+        self.odd_stamps = {}
+        self.fields = {name: [] for name in fields}
+        self.free = []
+
+    def allocate(self):
+        """Returns the number of an unused row"""
+        if self.free:
+            return self.free.pop()
+        self.flags.append(0)
+        self.ids.extend(bytes(16))
+        for column in self.stamps.values():
+            column.append(NO_STAMP)
+        for column in self.fields.values():
+            column.append(UNSET)
+        return len(self.flags) - 1
+
+    def release(self, row):
+        """Clears a row and makes it available again"""
+        self.flags[row] = 0
+        self.odd_ids.pop(row, None)
+        for name, column in self.stamps.items():
+            column[row] = NO_STAMP
+            self.odd_stamps.pop((name, row), None)
+        for column in self.fields.values():
+            column[row] = UNSET
+        self.free.append(row)
+
+
+class IdColumn:
+    """Stores canonical uuid ids as bytes, other ids as they are"""
+
+    def __get__(self, obj, cls=None):
+        """Returns the id of obj"""
+        if obj is None:
+            return self
+        table = cls._table
+        row = obj._row
+        flag = table.flags[row]
+        if flag == 1:
+            return str(uuid.UUID(bytes=bytes(table.ids[row * 16:
+                                                        row * 16 + 16])))
+        if flag == 2:
+            return table.odd_ids[row]
+        raise AttributeError("'{}' object has no attribute 'id'".format(
+            cls.__name__))
+
+    def __set__(self, obj, value):
+        """Sets the id of obj"""
+        table = obj._table
+        row = obj._row
+        try:
+            packed = uuid.UUID(value)
+        except (TypeError, ValueError, AttributeError):
+            packed = None
+        if packed is not None and str(packed) == value:
+            table.ids[row * 16:row * 16 + 16] = packed.bytes
+            table.odd_ids.pop(row, None)
+            table.flags[row] = 1
+        else:
+            table.odd_ids[row] = value
+            table.flags[row] = 2
+
+    def __delete__(self, obj):
+        """Unsets the id of obj"""
+        obj._table.odd_ids.pop(obj._row, None)
+        obj._table.flags[obj._row] = 0
+
+
+class StampColumn:
+    """Stores naive datetimes as microseconds, other values as they are"""
+
+    def __init__(self, name):
+        """Binds the descriptor to a timestamp attribute"""
+        self.name = name
+
+    def __get__(self, obj, cls=None):
+        """Returns the timestamp of obj"""
+        if obj is None:
+            return self
+        table = cls._table
+        value = table.stamps[self.name][obj._row]
+        if value != NO_STAMP:
+            return EPOCH + timedelta(microseconds=value)
+        value = table.odd_stamps.get((self.name, obj._row), UNSET)
+        if value is UNSET:
+            raise AttributeError("'{}' object has no attribute '{}'".format(
+                cls.__name__, self.name))
+        return value
+
+    def __set__(self, obj, value):
+        """Sets the timestamp of obj"""
+        table = obj._table
+        key = (self.name, obj._row)
+        if isinstance(value, str):
+            value = timestamps.parse(value)
+        if type(value) is datetime and value.tzinfo is None:
+            table.stamps[self.name][obj._row] = \
+                (value - EPOCH) // timedelta(microseconds=1)
+            table.odd_stamps.pop(key, None)
+        else:
+            table.stamps[self.name][obj._row] = NO_STAMP
+            table.odd_stamps[key] = value
+
+    def __delete__(self, obj):
+        """Unsets the timestamp of obj"""
+        obj._table.stamps[self.name][obj._row] = NO_STAMP
+        obj._table.odd_stamps.pop((self.name, obj._row), None)
+
+
+class FieldColumn:
+    """Stores a declared attribute, falling back to its class default"""
+
+    def __init__(self, name, default):
+        """Binds the descriptor to a declared attribute"""
+        self.name = name
+        self.default = default
+
+    def __get__(self, obj, cls=None):
+        """Returns the attribute of obj"""
+        if obj is None:
+            return self.default
+        value = cls._table.fields[self.name][obj._row]
+        return self.default if value is UNSET else value
+
+    def __set__(self, obj, value):
+        """Sets the attribute of obj"""
+        obj._table.fields[self.name][obj._row] = value
+
+    def __delete__(self, obj):
+        """Unsets the attribute of obj"""
+        obj._table.fields[self.name][obj._row] = UNSET
+
+
+class CompactModel:
+    """Mixin of the classes returned by `compact_model()`"""
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        """Creates an instance and gives it a row"""
+        obj = super().__new__(cls)
+        object.__setattr__(obj, "_row", cls._table.allocate())
+        return obj
+
+    def __del__(self):
+        """Frees the row of a discarded instance"""
+        row = getattr(self, "_row", None)
+        if row is not None:
+            self._table.release(row)
+
+    def __setattr__(self, name, value):
+        """Sets an attribute and records it in the instance layout"""
+        if name in SLOTS:
+            self._read_only(name)
+        super().__setattr__(name, value)
+        self._extend_layout(name)
+
+    def _load(self, name, value):
+        """Sets an attribute read from a dictionary, see `BaseModel`"""
+        if name in SLOTS:
+            self._read_only(name)
+        object.__setattr__(self, name, value)
+        self._extend_layout(name)
+
+    def _read_only(self, name):
+        """Raises the error of an assignment to the bookkeeping slots"""
+        raise AttributeError("'{}' object attribute '{}' is read-only"
+                             .format(type(self).__name__, name))
+
+    def _extend_layout(self, name):
+        """Adds name to the instance layout if it is not there yet"""
+        layout = getattr(self, "_layout", ())
+        if name not in layout:
+            step = (layout, name)
+            following = self._layouts.get(step)
+            if following is None:
+                following = self._layouts.setdefault(step, layout + (name,))
+            object.__setattr__(self, "_layout", following)
+
+    def __delattr__(self, name):
+        """Deletes an attribute and drops it from the instance layout"""
+        if name in SLOTS:
+            self._read_only(name)
+        super().__delattr__(name)
+        object.__setattr__(self, "_layout", tuple(
+            field for field in self._layout if field != name))
+
+    def _attributes(self):
+        """Returns the instance attributes in assignment order"""
+        attributes = {}
+        for name in getattr(self, "_layout", ()):
+            if name in self._columns:
+                attributes[name] = getattr(self, name)
+            else:
+                # Only touch the instance dictionary when it is in use
+                attributes[name] = self.__dict__[name]
+        return attributes
+
+    def _assigned(self, name):
+        """Tells if the instance has its own value of name, see
+        `BaseModel`
+
+        Unlike the layout, the columns are up to date while the storage
+        is told about an assignment.
+        """
+        column = self._table.fields.get(name)
+        if column is not None:
+            return column[self._row] is not UNSET
+        if name in self._columns:
+            return hasattr(self, name)
+        return name in self.__dict__
+
+
+def compact_model(cls):
+    """Returns the memory-compact variant of a model class
+
+    Unless HBNB_COMPACT_MODELS is set in the environment, cls is
+    returned as it is.
+    """
+    if not COMPACT:
+        return cls
+    defaults = {name: value for name, value in vars(cls).items()
+                if not name.startswith("_") and not callable(value)
+                and name not in ("indexed_attributes", "spatial_attributes",
+                                 "text_attributes", "sorted_attributes")}
+    namespace = {
+        "__slots__": SLOTS,
+        "__module__": cls.__module__,
+        "__qualname__": cls.__qualname__,
+        "__doc__": cls.__doc__,
+        "_table": Table(defaults),
+        "_layouts": {},
+        "_columns": frozenset(("id", "created_at", "updated_at")) |
+        frozenset(defaults),
+        "id": IdColumn(),
+        "created_at": StampColumn("created_at"),
+        "updated_at": StampColumn("updated_at"),
+    }
+    for name, default in defaults.items():
+        namespace[name] = FieldColumn(name, default)
+    return type(cls.__name__, (CompactModel, cls), namespace)
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""
+Module: batching.py
+
+Defines the `Batching` mixin of `FileStorage` and `SQLiteStorage`.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class Batching:
+    """Deferred saves and the bulk methods built on them
+
+    The storage provides `get()`, `delete()` and `save()`, and its
+    `save()` starts with `_defer()`. As the rest of the state of a
+    storage, the batch state lives in its class.
+    """
+    _batch_depth = 0
+    _deferred = False
+
+    @contextmanager
+    def batch(self):
+        """Defers every save until the end of the block
+
+        Usage:
+            with storage.batch():
+                for _ in range(10000):
+                    User().save()
+        """
+        type(self)._batch_depth += 1
+        try:
+            yield self
+        finally:
+            type(self)._batch_depth -= 1
+            if self._batch_depth == 0 and self._deferred:
+                self.save()
+
+    def _defer(self):
+        """Tells if a save must wait for the end of the batch
+
+        The save is then recorded, to be done on exit.
+        """
+        type(self)._deferred = self._batch_depth > 0
+        return self._deferred
+
+    def create_many(self, cls, attributes):
+        """Creates one instance of cls per dictionary of attributes
+
+        Returns:
+            the list of new instances, saved once.
+        """
+        created = []
+        with self.batch():
+            for values in attributes:
+                obj = cls()
+                for name, value in values.items():
+                    setattr(obj, name, value)
+                created.append(obj)
+            self.save()
+        return created
+
+    def update_many(self, cls, updates):
+        """Sets attributes on many instances of cls at once
+
+        Args:
+            cls: a class or class name.
+            updates: a dictionary of ids to dictionaries of attributes.
+
+        Returns:
+            the number of instances found and updated.
+        """
+        updated = 0
+        with self.batch():
+            for id, values in updates.items():
+                obj = self.get(cls, id)
+                if obj is None:
+                    continue
+                for name, value in values.items():
+                    setattr(obj, name, value)
+                obj.updated_at = datetime.now()
+                updated += 1
+            self.save()
+        return updated
+
+    def destroy_many(self, cls, ids):
+        """Deletes the instances of cls with the given ids
+
+        Returns:
+            the number of instances found and deleted.
+        """
+        destroyed = 0
+        with self.batch():
+            for id in ids:
+                obj = self.get(cls, id)
+                if obj is not None:
+                    self.delete(obj)
+                    destroyed += 1
+            self.save()
+        return destroyed
@@ -0,0 +1,377 @@
+#!/usr/bin/python3
+"""
+Module: bulk.py
+
+Imports objects from JSON-lines or CSV files into the storage, and
+exports them back, in chunks handled by a pool of processes.
+
+A JSON-lines file holds one object per line, as `to_dict()` writes it.
+A CSV file holds the objects of one class, with a header row of
+attribute names; lists and dictionaries are written as JSON, and empty
+cells are attributes the object does not have. Files
+ending in `.csv` are read and written as CSV, any other as JSON-lines.
+
+Importing reads the file one chunk of records at a time. The workers
+parse and validate every record of a chunk: the class must exist,
+timestamps must be in the ISO format of `models.timestamps`, and the
+declared attributes are converted to the type of their class default.
+Invalid records are skipped and reported. The valid ones are built and
+added to the storage in file order, and the storage is saved once at
+the end. Exporting hands chunks of `to_dict()` records to the workers
+to encode. Only a few chunks per worker are in flight at any time, so
+memory follows the chunk size rather than the size of the file.
+
+Usage:
+
+    $ python3 -m models.engine.bulk import users.csv User
+    $ python3 -m models.engine.bulk import dump.jsonl --workers 8
+    $ python3 -m models.engine.bulk export places.jsonl Place
+"""
+import argparse
+import collections
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import models
+from models import timestamps
+from models.base_model import classes
+
+CHUNK_SIZE = 10000
+# Invalid records reported at most, the others are only counted
+MAX_ERRORS = 100
+
+Report = collections.namedtuple("Report", "records skipped errors seconds")
+
+
+def import_file(path, cls=None, format=None, workers=None,
+                chunk_size=CHUNK_SIZE, progress=None, storage=None):
+    """Adds the objects of a JSON-lines or CSV file to the storage
+
+    Objects whose id is already stored replace the stored ones.
+
+    Args:
+        path: the file to read.
+        cls: a class or class name, needed unless every record names
+            its class in `__class__`.
+        format: `jsonl` or `csv`, guessed from path when None.
+        workers: the number of processes validating records, all the
+            CPUs when None; 0 or 1 validates them in this process.
+        chunk_size: the number of records handed to a worker at once.
+        progress: a function called with the number of records read
+            so far and the seconds elapsed after every chunk.
+        storage: the storage to fill, `models.storage` when None.
+
+    Returns:
+        a `Report` of the records added, the records skipped, the
+        messages of the first `MAX_ERRORS` invalid records and the
+        seconds taken.
+    """
+    storage = models.storage if storage is None else storage
+    format = format or _format(path)
+    class_name = cls if cls is None or isinstance(cls, str) else \
+        cls.__name__
+    started = time.perf_counter()
+    added = skipped = read = 0
+    errors = []
+    chunks = _read_chunks(path, format, class_name, chunk_size)
+    for records, problems, count in _pipeline(_validate, chunks, workers):
+        for record in records:
+            storage.new(classes[record["__class__"]](**record))
+        added += len(records)
+        skipped += len(problems)
+        errors.extend(problems[:MAX_ERRORS - len(errors)])
+        read += count
+        if progress is not None:
+            progress(read, time.perf_counter() - started)
+    # One write for the whole file
+    storage.save()
+    return Report(added, skipped, errors, time.perf_counter() - started)
+
+
+def export_file(path, cls=None, format=None, workers=None,
+                chunk_size=CHUNK_SIZE, progress=None, storage=None):
+    """Writes the stored objects to a JSON-lines or CSV file
+
+    Args:
+        path: the file to write.
+        cls: a class or class name to export only its objects; needed
+            for CSV.
+        format: `jsonl` or `csv`, guessed from path when None.
+        workers: the number of processes encoding records, all the
+            CPUs when None; 0 or 1 encodes them in this process.
+        chunk_size: the number of records handed to a worker at once.
+        progress: a function called with the number of records written
+            so far and the seconds elapsed after every chunk.
+        storage: the storage to read, `models.storage` when None.
+
+    Returns:
+        a `Report` of the records written and the seconds taken.
+    """
+    storage = models.storage if storage is None else storage
+    format = format or _format(path)
+    if format == "csv" and cls is None:
+        raise ValueError("a class is needed to export CSV")
+    started = time.perf_counter()
+    objects = storage.all(cls).values()
+    columns = None
+    if format == "csv":
+        # Every attribute any object has, in first assignment order
+        columns = {}
+        for obj in objects:
+            columns.update(dict.fromkeys(obj._attributes()))
+        columns.pop("__class__", None)
+        columns = list(columns)
+
+    def chunks():
+        iterator = iter(objects)
+        while True:
+            records = [obj.to_dict() for obj in
+                       itertools.islice(iterator, chunk_size)]
+            if not records:
+                return
+            yield format, columns, records
+
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if columns is not None:
+            csv.writer(file).writerow(columns)
+        for text, count in _pipeline(_encode, chunks(), workers):
+            file.write(text)
+            written += count
+            if progress is not None:
+                progress(written, time.perf_counter() - started)
+    return Report(written, 0, [], time.perf_counter() - started)
+
+
+def _format(path):
+    """Returns the format of a file from its name"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _pipeline(work, chunks, workers=None):
+    """Yields work(*chunk) for every chunk, in order
+
+    The chunks are handed to a pool of workers processes, with at most
+    two per worker waiting for their result.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for chunk in chunks:
+            yield work(*chunk)
+        return
+
+    # Forked workers have the models already, spawned ones would load
+    # the whole storage again when importing them
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.submit(work, *chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _read_chunks(path, format, class_name, chunk_size):
+    """Yields the arguments of `_validate()` for each chunk of a file"""
+    with open(path, encoding="utf-8", newline="") as file:
+        if format == "csv":
+            reader = csv.reader(file)
+            header = next(reader, None)
+            first = 1
+            while header is not None:
+                rows = list(itertools.islice(reader, chunk_size))
+                if not rows:
+                    return
+                yield format, class_name, first, rows, header
+                first += len(rows)
+        else:
+            first = 1
+            while True:
+                lines = list(itertools.islice(file, chunk_size))
+                if not lines:
+                    return
+                yield format, class_name, first, lines, None
+                first += len(lines)
+
+
+def _validate(format, class_name, first, items, header):
+    """Returns the valid records of a chunk, its errors and its size
+
+    Args:
+        format: `jsonl` or `csv`.
+        class_name: the class of records that do not name one.
+        first: the line number (JSON-lines) or row number (CSV) of the
+            first item.
+        items: lines of JSON, or rows of CSV values.
+        header: the attribute names of the CSV columns.
+    """
+    records = []
+    errors = []
+    where = "line" if format == "jsonl" else "row"
+    for number, item in enumerate(items, first):
+        try:
+            if format == "csv":
+                if len(item) != len(header):
+                    raise ValueError("{} values for {} columns".format(
+                        len(item), len(header)))
+                record = dict(zip(header, item))
+            else:
+                if not item.strip():
+                    continue
+                record = json.loads(item)
+                if not isinstance(record, dict):
+                    raise ValueError("not an object")
+            records.append(_check(record, class_name, format == "csv"))
+        except (ValueError, TypeError) as error:
+            errors.append("{} {}: {}".format(where, number, error))
+    return records, errors, len(items)
+
+
+def _check(record, class_name, text):
+    """Returns a record with its class, id, timestamps and types checked
+
+    Args:
+        record: a dictionary of attributes.
+        class_name: the class of the record if it does not name one.
+        text: whether the values are strings read from CSV.
+
+    Raises:
+        ValueError, TypeError: when the record is invalid.
+    """
+    name = record.get("__class__") or class_name
+    if name is None:
+        raise ValueError("class name missing")
+    if class_name is not None and name != class_name:
+        raise ValueError("{} record in a {} import".format(name, class_name))
+    cls = classes.get(name)
+    if cls is None:
+        raise ValueError("class {} doesn't exist".format(name))
+
+    checked = {}
+    for key, value in record.items():
+        if key == "__class__" or key.startswith("_"):
+            continue
+        if key in ("created_at", "updated_at"):
+            # A real date, kept as the string it was read as
+            timestamps.parse(value)
+            checked[key] = value
+        elif key == "id":
+            if not isinstance(value, str) or not value:
+                raise ValueError("invalid id: {!r}".format(value))
+            checked[key] = value
+        elif text and value == "":
+            # An object without that attribute, or with the default
+            continue
+        else:
+            default = getattr(cls, key, None)
+            if callable(default):
+                raise ValueError("{} is not an attribute".format(key))
+            checked[key] = _cast(key, default, value, text)
+
+    if "id" not in checked:
+        checked["id"] = str(uuid.uuid4())
+    if "created_at" not in checked:
+        checked["created_at"] = timestamps.format(datetime.now())
+    if "updated_at" not in checked:
+        checked["updated_at"] = checked["created_at"]
+    checked["__class__"] = name
+    return checked
+
+
+def _cast(name, default, value, text):
+    """Returns value as the type of the class default of an attribute"""
+    if default is None or isinstance(default, bool) or \
+            not isinstance(default, (str, int, float, list, dict)):
+        # Not a declared attribute: kept as read
+        return value
+    expected = type(default)
+    try:
+        if text and expected in (list, dict):
+            value = json.loads(value)
+        elif text or (expected is str and value is not None):
+            value = expected(value)
+        elif expected is float and isinstance(value, int):
+            value = float(value)
+    except ValueError:
+        pass
+    if not isinstance(value, expected) or isinstance(value, bool):
+        raise ValueError("{} must be {}: {!r}".format(
+            name, expected.__name__, value))
+    return value
+
+
+def _encode(format, columns, records):
+    """Returns the text of a chunk of records and its size"""
+    if format == "jsonl":
+        text = "".join(json.dumps(record, separators=(",", ":")) + "\n"
+                       for record in records)
+        return text, len(records)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        row = []
+        for column in columns:
+            value = record.get(column, "")
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            row.append(value)
+        writer.writerow(row)
+    return buffer.getvalue(), len(records)
+
+
+def main(argv):
+    """Parses the command line and runs an import or an export"""
+    parser = argparse.ArgumentParser(
+        prog="python3 -m models.engine.bulk",
+        description="Imports or exports objects as JSON-lines or CSV.")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="the file to read or write")
+    parser.add_argument("cls", nargs="?", metavar="CLASS",
+                        help="the class of the objects")
+    parser.add_argument("--format", choices=("jsonl", "csv"),
+                        help="the file format (default: from the name)")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="records per chunk (default: %(default)s)")
+    options = parser.parse_args(argv)
+    if options.cls is not None and options.cls not in classes:
+        parser.error("class {} doesn't exist".format(options.cls))
+
+    def progress(count, seconds):
+        sys.stderr.write("\r{} records, {:.0f}/s".format(
+            count, count / seconds if seconds else 0))
+
+    action = import_file if options.action == "import" else export_file
+    try:
+        report = action(options.path, options.cls, options.format,
+                        options.workers, options.chunk_size, progress)
+    except (OSError, ValueError) as error:
+        sys.stderr.write("{}\n".format(error))
+        return 1
+    sys.stderr.write("\r{} {} records in {:.2f}s ({:.0f}/s)\n".format(
+        options.action + "ed", report.records, report.seconds,
+        report.records / report.seconds if report.seconds else 0))
+    if report.skipped:
+        sys.stderr.write("{} invalid records skipped:\n".format(
+            report.skipped))
+        for error in report.errors:
+            sys.stderr.write("  {}\n".format(error))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,21 @@
+#!/usr/bin/python3
+"""
+Module: convert.py
+
+Converts a `FileStorage` snapshot from one format to another.
+
+Usage:
+
+    $ python3 -m models.engine.convert file.json file.hbnb columnar
+    $ python3 -m models.engine.convert file.hbnb file.json json
+"""
+import sys
+from models.engine import snapshot
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[3] not in snapshot.FORMATS:
+        print("Usage: {} SOURCE DESTINATION {{{}}}".format(
+            sys.argv[0], "|".join(snapshot.FORMATS)))
+        sys.exit(1)
+    snapshot.convert(sys.argv[1], sys.argv[2], sys.argv[3])
@@ -4,9 +4,20 @@ Module: file_storage.py
 
 Defines a `FileStorage` class.
 """
+import atexit
+import heapq
+import itertools
 import json
+import mmap
 import os
-from models.base_model import BaseModel
+import threading
+import weakref
+from contextlib import contextmanager
+from models.engine import fulltext, snapshot
+from models.engine.batching import Batching
+from models.engine.ranges import SortedIndex, kind
+from models.engine.spatial import Grid
+from models.base_model import BaseModel, classes
 from models.user import User
 from models.state import State
 from models.review import Review
@@ -14,51 +25,1178 @@ from models.place import Place
 from models.city import City
 from models.amenity import Amenity
 
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks on this platform
+    fcntl = None
 
-class FileStorage:
-    """Class to serialize and Deserialize python objects"""
+
+class FileStorage(Batching):
+    """Class to serialize and Deserialize python objects
+
+    By default every save rewrites the whole JSON file. In journal mode
+    (see `enable_journal()`) a save only appends the objects that were
+    added, saved or deleted since the last save to a journal file next to
+    the JSON file, and the journal is folded back into a fresh snapshot
+    once it grows past a size threshold.
+
+    Objects report attribute assignments through `touch()`. From its
+    second snapshot on, a process keeps the last serialized form of
+    every object and only re-runs `to_dict()` for objects that changed
+    since the previous save; most processes write once, and for them the
+    cache would only cost memory.
+
+    Objects are also indexed by class name so that class-scoped listing
+    and counting never have to scan the whole store, and by the value of
+    every attribute their class lists in `indexed_attributes`, which
+    `filter()` uses to answer foreign-key lookups. Classes that name a
+    latitude and a longitude attribute in `spatial_attributes` are also
+    kept in a grid of their coordinates for `near()` and `within()`.
+    The words of the attributes listed in `text_attributes` go to an
+    inverted index for `search()`, built on the first search and saved
+    next to the snapshot, see `search_path()`. The attributes listed in
+    `sorted_attributes` get a sorted index the first time `select()`
+    asks for a range or an order on them.
+
+    In lazy mode (see `enable_lazy()`) `reload()` does not read the file.
+    Objects are built the first time they are asked for: `get()` decodes
+    just the requested record, a class-scoped `all()`, `count()` or
+    `filter()` builds only that class, and a plain `all()` builds the rest.
+
+    Snapshots are written in the format chosen with `set_format()`, see
+    `models.engine.snapshot`, and read back in whichever format they hold.
+    In lazy mode `get()` maps an `indexed` snapshot into memory and only
+    decodes the requested record.
+
+    Inside a `batch()` block saves are deferred and done once on exit,
+    which is what the bulk `create_many()`, `update_many()` and
+    `destroy_many()` methods rely on. With `start_writer()` saves are
+    left to a background thread instead. Snapshots are always written to
+    a temporary file first and renamed over the previous one.
+
+    In shared mode (see `enable_shared()`) several threads and processes
+    can use the same file: `all()` hands out a copy taken under the
+    storage lock, writes hold an advisory lock on a `.lock` file next to
+    the JSON file, and a write first folds in whatever other processes
+    wrote since this one last read or wrote the file.
+
+    In sharded mode (see `enable_sharding()`) every class is kept in a
+    file of its own, see `shard_path()`. A class is read the first time
+    one of its objects is asked for, and a save only rewrites the files
+    of the classes that changed. Sharded saves neither use the journal
+    nor merge with other processes.
+    """
     __file_path = 'file.json'
     __objects = {}
+    __journal = False
+    __journal_limit = 1024 * 1024
+    __dirty = weakref.WeakSet()
+    __deleted = set()
+    __cache = {}
+    __dumped = False
+    __classes = {}
+    __attributes = {}
+    __grids = {}
+    __texts = None
+    __orders = {}
+    __generation = 0
+    __lazy = False
+    __unloaded = False
+    __raw = None
+    __format = 'json'
+    __lock = threading.RLock()
+    __writing = threading.RLock()
+    __wakeup = threading.Condition()
+    __writer = None
+    __stopping = False
+    __interval = 1.0
+    __threshold = 100
+    __changes = 0
+    __error = None
+    __shared = False
+    __seen = None
+    __lock_file = None
+    __sharded = False
+    __shards = set()
+
+    def all(self, cls=None):
+        """Returns the __objects dictionary
+
+        Args:
+            cls: a class or class name. When given, only the objects of
+                that class are returned, keyed by className.id.
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        self.__materialize(cls)
+        objects = self.__objects if cls is None else \
+            self.__classes.get(cls, {})
+        if self.__shared:
+            # Iterating the live dictionary would race with other threads
+            with self.__lock:
+                return dict(objects)
+        return objects
+
+    def get(self, cls, id):
+        """Returns the object of class cls with the given id, or None"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        key = "{}.{}".format(cls, id)
+        obj = self.__objects.get(key)
+        if obj is None and self.__unloaded:
+            if self.__sharded:
+                self.__materialize(cls)
+                return self.__objects.get(key)
+            with self.__lock:
+                record = self.__find(key)
+                if record is not None:
+                    obj = self.__build(record)
+                    self.__register(key, obj)
+        return obj
+
+    def filter(self, cls, **criteria):
+        """Returns the objects of cls whose attributes equal criteria
+
+        Example: storage.filter(Review, place_id=place.id)
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        self.__materialize(cls)
+
+        with self.__lock:
+            # Start from the smallest matching index bucket, if any
+            candidates = None
+            for name, value in criteria.items():
+                index = self.__attributes.get((cls, name))
+                if index is None:
+                    continue
+                bucket = index.get(self.__index_key(value), {})
+                if candidates is None or len(bucket) < len(candidates):
+                    candidates = bucket
+            if candidates is None:
+                candidates = self.__classes.get(cls, {})
 
-    def all(self):
-        """Returns the __objects dictionary"""
-        return self.__objects
+            return {key: obj for key, obj in candidates.items()
+                    if all(getattr(obj, name, None) == value
+                           for name, value in criteria.items())}
+
+    def count(self, cls=None):
+        """Returns the number of objects, optionally of one class only"""
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        self.__materialize(cls)
+        if cls is None:
+            return len(self.__objects)
+        return len(self.__classes.get(cls, {}))
 
     def new(self, obj):
         """Adds the object to the __objects dictionary"""
         key = "{}.{}".format(obj.__class__.__name__, obj.id)
 
         # the obj object is set in __object with key className.id
+        with self.__lock:
+            FileStorage.__generation += 1
+            self.__register(key, obj)
+            self.__deleted.discard(key)
+            self.__dirty.add(obj)
+            self.__forget(key)
+
+    def delete(self, obj=None):
+        """Removes obj from the __objects dictionary if it's inside"""
+        if obj is None:
+            return
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self.__lock:
+            FileStorage.__generation += 1
+            if self.__unregister(key) is not None:
+                self.__deleted.add(key)
+                self.__cache.pop(key, None)
+            self.__forget(key)
+
+    def __register(self, key, obj):
+        """Stores obj under key in __objects and the indexes"""
+        old = self.__objects.get(key)
+        if old is obj:
+            return
+        if old is not None:
+            self.__unregister(key)
         self.__objects[key] = obj
+        cls = obj.__class__.__name__
+        self.__classes.setdefault(cls, {})[key] = obj
+        for name in obj.indexed_attributes:
+            index = self.__attributes.setdefault((cls, name), {})
+            value = self.__index_key(getattr(obj, name, None))
+            index.setdefault(value, {})[key] = obj
+        if obj.spatial_attributes:
+            self.__locate(cls, key, obj)
+        if obj.text_attributes and self.__texts is not None:
+            self.__index_text(cls, key, obj)
+        if self.__orders:
+            for name in obj.sorted_attributes:
+                index = self.__orders.get((cls, name))
+                if index is not None:
+                    index.add(key, getattr(obj, name, None))
+
+    def __locate(self, cls, key, obj):
+        """Puts obj at its coordinates in the grid of its class"""
+        grid = self.__grids.get(cls)
+        if grid is None:
+            grid = self.__grids[cls] = Grid()
+        # Not the class defaults: objects never given coordinates are
+        # nowhere
+        latitude, longitude = [
+            getattr(obj, name) if obj._assigned(name) else None
+            for name in obj.spatial_attributes]
+        grid.add(key, obj, latitude, longitude)
+
+    def __unregister(self, key):
+        """Removes key from __objects and the indexes"""
+        obj = self.__objects.pop(key, None)
+        if obj is not None:
+            cls = obj.__class__.__name__
+            self.__classes.get(cls, {}).pop(key, None)
+            for name in obj.indexed_attributes:
+                self.__unindex(cls, name, getattr(obj, name, None), key)
+            if cls in self.__grids:
+                self.__grids[cls].remove(key)
+            if self.__texts is not None and cls in self.__texts:
+                self.__texts[cls].remove(key)
+            if self.__orders:
+                for name in obj.sorted_attributes:
+                    index = self.__orders.get((cls, name))
+                    if index is not None:
+                        index.remove(key)
+        return obj
+
+    def __unindex(self, cls, name, value, key):
+        """Removes key from the index bucket of an attribute value"""
+        index = self.__attributes.get((cls, name), {})
+        value = self.__index_key(value)
+        bucket = index.get(value)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del index[value]
+
+    @staticmethod
+    def __index_key(value):
+        """Returns a hashable stand-in for an attribute value"""
+        try:
+            hash(value)
+        except TypeError:
+            return repr(value)
+        return value
+
+    def touch(self, obj, name=None, old=None):
+        """Marks obj as changed since the last save
+
+        Args:
+            obj: the changed object.
+            name: the attribute that was assigned, if any.
+            old: the previous value of name, when name is indexed.
+        """
+        with self.__lock:
+            self.__dirty.add(obj)
+            FileStorage.__generation += 1
+            indexed = name in obj.indexed_attributes
+            spatial = name in obj.spatial_attributes
+            text = name in obj.text_attributes and self.__texts is not None
+            ordered = name in obj.sorted_attributes and bool(self.__orders)
+            if not indexed and not spatial and not text and not ordered:
+                return
+            cls = obj.__class__.__name__
+            key = "{}.{}".format(cls, getattr(obj, "id", None))
+            if self.__objects.get(key) is not obj:
+                return
+            if indexed:
+                self.__unindex(cls, name, old, key)
+                index = self.__attributes.setdefault((cls, name), {})
+                value = self.__index_key(getattr(obj, name, None))
+                index.setdefault(value, {})[key] = obj
+            if spatial:
+                self.__locate(cls, key, obj)
+            if text:
+                self.__index_text(cls, key, obj)
+            if ordered and (cls, name) in self.__orders:
+                self.__orders[(cls, name)].add(key, getattr(obj, name, None))
+
+    def near(self, cls, latitude, longitude, radius_km):
+        """Returns the objects of cls within radius_km of a point
+
+        The objects are ordered from the nearest to the farthest.
+
+        Example: storage.near(Place, 48.8566, 2.3522, 5)
+        """
+        return {key: obj for _, key, obj in
+                self.__spatial(cls, "near", latitude, longitude, radius_km)}
+
+    def within(self, cls, south, west, north, east):
+        """Returns the objects of cls inside a latitude/longitude box
+
+        The box spans the antimeridian when west is greater than east.
+        """
+        return {key: obj for key, obj, _, _ in
+                self.__spatial(cls, "box", south, west, north, east)}
+
+    def __spatial(self, cls, query, *args):
+        """Runs a query on the grid of cls, dropping stale entries"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        self.__materialize(cls)
+        with self.__lock:
+            grid = self.__grids.get(cls)
+            if grid is None:
+                return []
+            found = getattr(grid, query)(*args)
+            key = 1 if query == "near" else 0
+            return [item for item in found
+                    if self.__objects.get(item[key]) is item[key + 1]]
+
+    def select(self, cls, order_by=None, limit=None, offset=0, **ranges):
+        """Returns the objects of cls in ranges of values, in order
+
+        Args:
+            cls: a class or class name.
+            order_by: the attribute to order the objects by, prefixed
+                with '-' for descending order.
+            limit: the largest number of objects to return.
+            offset: the number of objects to skip first.
+            ranges: attribute=(low, high) bounds, both included, with
+                None for an open end.
+
+        Every attribute named must be listed in the `sorted_attributes`
+        of cls, and objects whose value of one of them is not a number
+        or a datetime are left out.
+
+        Raises:
+            ValueError: when an attribute is not sorted, or a bound
+                cannot be compared with its values.
+
+        Example: storage.select(Place, price_by_night=(50, 120),
+                                order_by="-updated_at", limit=100)
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        descending = order_by is not None and order_by.startswith('-')
+        if descending:
+            order_by = order_by[1:]
+        model = classes.get(cls)
+        names = set(ranges) if order_by is None else set(ranges) | {order_by}
+        for name in names:
+            if model is None or name not in model.sorted_attributes:
+                raise ValueError("{}.{} is not sorted".format(cls, name))
+        stop = None if limit is None else offset + limit
+        self.__materialize(cls)
+
+        with self.__lock:
+            indexes = {name: self.__sorted_index(cls, name)
+                       for name in names}
+            for name, (low, high) in ranges.items():
+                for bound in (low, high):
+                    if bound is not None and indexes[name].kind and \
+                            kind(bound) is not indexes[name].kind:
+                        raise ValueError("{!r} cannot bound {}.{}".format(
+                            bound, cls, name))
+            if not names:
+                keys = itertools.islice(self.__classes.get(cls, {}),
+                                        offset, stop)
+                return {key: self.__objects[key] for key in keys}
+
+            # Start from the range holding the fewest objects
+            sizes = {}
+            for name, bounds in ranges.items():
+                start, end = indexes[name].bounds(*bounds)
+                sizes[name] = end - start
+            narrowest = min(sizes, key=sizes.get) if sizes else None
+
+            def matches(key):
+                for name, (low, high) in ranges.items():
+                    value = indexes[name].values.get(key)
+                    if value is None or (low is not None and value < low) \
+                            or (high is not None and value > high):
+                        return False
+                return order_by is None or key in indexes[order_by].values
+
+            if order_by is None:
+                order_by = narrowest
+            order = indexes[order_by]
+            # Walking the order index until enough objects matched costs
+            # about (offset + limit) * len(order) / sizes[narrowest]
+            if narrowest is None or order_by == narrowest or \
+                    (stop is not None and
+                     stop * len(order.entries) < sizes[narrowest] ** 2):
+                keys = order.keys(*ranges.get(order_by, (None, None)),
+                                  descending=descending)
+                keys = itertools.islice(filter(matches, keys), offset, stop)
+            else:
+                # Rank the objects of the narrowest range without sorting
+                # more than the limit
+                candidates = filter(matches, indexes[narrowest].keys(
+                    *ranges[narrowest]))
+                pairs = ((order.values[key], key) for key in candidates)
+                if stop is None:
+                    ranked = sorted(pairs, reverse=descending)
+                elif descending:
+                    ranked = heapq.nlargest(stop, pairs)
+                else:
+                    ranked = heapq.nsmallest(stop, pairs)
+                keys = (key for _, key in ranked[offset:])
+            return {key: self.__objects[key] for key in keys}
+
+    def __sorted_index(self, cls, name):
+        """Returns the sorted index of an attribute, building it first"""
+        index = self.__orders.get((cls, name))
+        if index is None:
+            index = SortedIndex((key, getattr(obj, name, None))
+                                for key, obj in
+                                self.__classes.get(cls, {}).items())
+            self.__orders[(cls, name)] = index
+        return index
+
+    def search(self, cls, query, limit=None):
+        """Returns the objects matching a full-text query, best first
+
+        Args:
+            cls: a class or class name, or None to search every class
+                with `text_attributes`.
+            query: words that must all be found in the text attributes
+                of an object, with OR between alternatives, see
+                `models.engine.fulltext`.
+            limit: the largest number of objects to return.
+
+        Example: storage.search(Place, "pool wifi OR beach")
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        texts = self.__text_indexes()
+        scores = {}
+        with self.__lock:
+            for name in (texts if cls is None else [cls]):
+                if name in texts:
+                    scores.update(texts[name].scores(query))
+        found = {}
+        for _, key in fulltext.best(scores, limit):
+            name, _, id = key.partition('.')
+            obj = self.get(name, id)
+            if obj is not None:
+                found[key] = obj
+        return found
+
+    def __index_text(self, cls, key, obj):
+        """Indexes the words of the text attributes of obj"""
+        index = self.__texts.get(cls)
+        if index is None:
+            index = self.__texts[cls] = fulltext.TextIndex()
+        index.add(key, [getattr(obj, name, None)
+                        for name in obj.text_attributes])
+
+    def __text_indexes(self):
+        """Returns the text index of every class, loading them first
+
+        The indexes saved in `search_path()` are used if they were saved
+        for the files this process read, and otherwise built from the
+        objects and saved for the next processes.
+        """
+        with self.__lock:
+            if self.__texts is not None:
+                return self.__texts
+            texts = self.__read_postings()
+            built = texts is None
+            if built:
+                names = self.__text_classes()
+                for name in names:
+                    self.__materialize(name)
+                texts = {name: fulltext.TextIndex() for name in names}
+                FileStorage.__texts = texts
+                for name in names:
+                    for key, obj in self.__classes.get(name, {}).items():
+                        self.__index_text(name, key, obj)
+            else:
+                FileStorage.__texts = texts
+                # Changes made here since the files were read
+                for key in self.__deleted:
+                    if key.split('.')[0] in texts:
+                        texts[key.split('.')[0]].remove(key)
+                for obj in list(self.__dirty):
+                    key = "{}.{}".format(obj.__class__.__name__, obj.id)
+                    if obj.text_attributes and \
+                            self.__objects.get(key) is obj:
+                        self.__index_text(obj.__class__.__name__, key, obj)
+        if built:
+            self.__save_postings()
+        return texts
+
+    @staticmethod
+    def __text_classes():
+        """Returns the text attributes of every class that has some"""
+        return {name: list(model.text_attributes)
+                for name, model in classes.items() if model.text_attributes}
+
+    def __read_postings(self):
+        """Returns the saved text indexes, or None if they are stale"""
+        if self.__sharded or self.__seen is None or \
+                not os.path.isfile(self.search_path()):
+            return None
+        try:
+            with open(self.search_path(), encoding='utf-8') as file:
+                saved = json.load(file)
+        except ValueError:
+            return None
+        if saved.get("source") != self.__source() or \
+                saved.get("attributes") != self.__text_classes():
+            return None
+        return {name: fulltext.TextIndex(postings)
+                for name, postings in saved["postings"].items()}
+
+    def __save_postings(self):
+        """Saves the text indexes if they match the files on disk"""
+        if self.__sharded:
+            return
+        with self.__lock:
+            if self.__texts is None or self.__dirty or self.__deleted or \
+                    self.__seen != self.__version():
+                # Not built yet, or not what the files hold
+                return
+            data = json.dumps({
+                "source": self.__source(),
+                "attributes": self.__text_classes(),
+                "postings": {name: index.postings
+                             for name, index in self.__texts.items()},
+            }, separators=(',', ':')).encode('utf-8')
+        self.__write_atomically(self.search_path(), data)
+
+    def __source(self):
+        """Returns the version of the files read, as stored in JSON"""
+        return [list(part) if part is not None else None
+                for part in self.__seen]
+
+    def refresh(self):
+        """Folds in what other processes saved since this one last looked
+
+        Unlike the merge done before every write in shared mode, this
+        works in any mode but the sharded one, so a process that only
+        reads can follow the processes writing the same file.
+
+        Returns:
+            True if the files had changed.
+        """
+        if self.__sharded or self.__version() == self.__seen:
+            return False
+        with self.__writing, self.__locked(exclusive=False):
+            self.__merge(always=True)
+        return True
+
+    def generation(self):
+        """Returns a number that changes whenever objects are added,
+        deleted, assigned an attribute or read again from disk"""
+        return self.__generation
+
+    def reset(self, file_path='file.json'):
+        """Forgets every object, index and pending change and switches
+        every mode back off, without reading or writing anything
+
+        The state of the storage lives in the class, so this is how tests
+        start from a clean storage. Stop the writer thread with `close()`
+        first, if it was started.
+
+        Args:
+            file_path: the snapshot file to use from now on.
+        """
+        with self.__lock:
+            FileStorage.__file_path = file_path
+            FileStorage.__objects = {}
+            FileStorage.__classes = {}
+            FileStorage.__attributes = {}
+            FileStorage.__grids = {}
+            FileStorage.__texts = None
+            FileStorage.__orders = {}
+            FileStorage.__dirty = weakref.WeakSet()
+            FileStorage.__deleted = set()
+            FileStorage.__cache = {}
+            FileStorage.__dumped = False
+            FileStorage.__raw = None
+            FileStorage.__unloaded = False
+            FileStorage.__shards = set()
+            FileStorage.__seen = None
+            FileStorage._batch_depth = 0
+            FileStorage._deferred = False
+            FileStorage.__changes = 0
+            FileStorage.__error = None
+            FileStorage.__journal = False
+            FileStorage.__journal_limit = 1024 * 1024
+            FileStorage.__lazy = False
+            FileStorage.__format = 'json'
+            FileStorage.__shared = False
+            FileStorage.__sharded = False
+            FileStorage.__generation += 1
+
+    def enable_journal(self, limit=None):
+        """Switches the storage to journal mode
+
+        Args:
+            limit: size in bytes the journal may reach before it is
+                compacted into a new snapshot.
+        """
+        FileStorage.__journal = True
+        if limit is not None:
+            FileStorage.__journal_limit = limit
+
+    def enable_lazy(self):
+        """Switches the storage to lazy loading, see `reload()`"""
+        FileStorage.__lazy = True
+
+    def enable_shared(self):
+        """Lets several threads and processes use the same file
+
+        Concurrent saves of different objects are merged, and when two
+        processes save the same object the last save wins.
+        """
+        FileStorage.__shared = True
+        FileStorage.__seen = self.__version()
+
+    def enable_sharding(self):
+        """Switches the storage to one file per class"""
+        FileStorage.__sharded = True
+
+    def shard_path(self, cls):
+        """Returns the path of the file holding the objects of cls
+
+        Args:
+            cls: a class or class name.
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        return os.path.join(self.__file_path + '.d', cls + '.json')
+
+    def lock_path(self):
+        """Returns the path of the advisory lock file"""
+        return self.__file_path + '.lock'
+
+    def set_format(self, format):
+        """Selects the snapshot format written by the next save
+
+        Args:
+            format: a name from `models.engine.snapshot.FORMATS`.
+        """
+        if format not in snapshot.FORMATS:
+            raise ValueError("unknown snapshot format: {}".format(format))
+        FileStorage.__format = format
+        self.__cache.clear()
+
+    def journal_path(self):
+        """Returns the path of the journal file"""
+        return self.__file_path + '.journal'
+
+    def search_path(self):
+        """Returns the path of the saved text indexes"""
+        return self.__file_path + '.search'
 
     def save(self):
         """Serializes __objects to JSON file, __file_path"""
-        # create new dictionary to store serialized object
-        serialized_objects = {}
+        if self._defer():
+            return
+        if self.__writer is not None:
+            # The writer thread saves for us
+            with self.__wakeup:
+                FileStorage.__changes += 1
+                if self.__changes >= self.__threshold:
+                    self.__wakeup.notify()
+                error = self.__error
+                FileStorage.__error = None
+            if error is not None:
+                # The last write of the thread failed, its changes are
+                # still pending
+                raise error
+            return
+        self.flush()
+
+    def flush(self):
+        """Writes every change made since the last write to disk now"""
+        with self.__writing, self.__locked():
+            FileStorage.__changes = 0
+            if not self.__journal or self.__sharded:
+                # A snapshot must hold the objects not loaded yet too
+                self.compact()
+                return
+
+            self.__merge()
+            dirty, deleted, _ = self.__take_changes(False)
+            try:
+                self.__append_journal(dirty, deleted)
+            except BaseException:
+                self.__give_back(dirty, deleted)
+                raise
+            self.__mark_seen()
+
+            if os.path.getsize(self.journal_path()) > self.__journal_limit:
+                self.compact()
+
+    def __append_journal(self, dirty, deleted):
+        """Appends one compact record per pending change to the journal"""
+        with open(self.journal_path(), 'ab+') as file:
+            end = file.seek(0, os.SEEK_END)
+            if end:
+                file.seek(end - 1)
+                if file.read(1) != b'\n':
+                    # End the torn line of an interrupted append, so that
+                    # the records written now are not glued to it
+                    file.write(b'\n')
+            for key in deleted:
+                file.write(self.__journal_line(["del", key]))
+            for obj in dirty:
+                key = "{}.{}".format(obj.__class__.__name__, obj.id)
+                if self.__objects.get(key) is not obj:
+                    continue
+                # The cached snapshot text is stale now
+                self.__cache.pop(key, None)
+                file.write(self.__journal_line(["set", key, obj.to_dict()]))
+
+    @staticmethod
+    def __journal_line(record):
+        """Returns the bytes of one line of the journal"""
+        return (json.dumps(record, separators=(',', ':')) + '\n').encode(
+            'utf-8')
+
+    def compact(self):
+        """Writes a full snapshot of __objects and drops the journal
+
+        In sharded mode only the files of the classes with changes are
+        written.
+        """
+        with self.__writing, self.__locked():
+            if self.__sharded:
+                self.__write_shards()
+                return
+            self.__merge()
+            self.__materialize()
+            dirty, deleted, items = self.__take_changes(True)
+            try:
+                data = self.__dump(items, dirty)
+                self.__write_atomically(self.__file_path, data)
+            except BaseException:
+                self.__give_back(dirty, deleted)
+                raise
+
+            # The snapshot now holds every journaled change
+            if os.path.isfile(self.journal_path()):
+                os.remove(self.journal_path())
+            self.__mark_seen()
+            self.__save_postings()
+
+    def __write_shards(self):
+        """Rewrites the file of every class with changes"""
+        with self.__lock:
+            names = {obj.__class__.__name__ for obj in self.__dirty}
+            names.update(key.split('.')[0] for key in self.__deleted)
+            for name in names:
+                # The rest of the class must not vanish from its file
+                self.__materialize(name)
+            dirty, deleted, _ = self.__take_changes(False)
+            shards = {name: list(self.__classes.get(name, {}).items())
+                      for name in names}
+
+        try:
+            for name, items in shards.items():
+                path = self.shard_path(name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.__write_atomically(path, self.__dump(items, dirty))
+        except BaseException:
+            self.__give_back(dirty, deleted)
+            raise
+
+    @contextmanager
+    def __locked(self, exclusive=True):
+        """Holds the advisory lock file in shared mode
+
+        Only called with __writing held, which makes it reentrant: the
+        thread that took the lock file is the only one that can get here
+        again before it is released.
+        """
+        if not self.__shared or fcntl is None or \
+                self.__lock_file is not None:
+            yield
+            return
+        with open(self.lock_path(), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            FileStorage.__lock_file = file
+            try:
+                yield
+            finally:
+                FileStorage.__lock_file = None
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def __version(self):
+        """Returns what identifies the current content of the files"""
+        version = []
+        for path in (self.__file_path, self.journal_path()):
+            try:
+                status = os.stat(path)
+            except OSError:
+                version.append(None)
+            else:
+                version.append((status.st_ino, status.st_size,
+                                status.st_mtime_ns))
+        return tuple(version)
+
+    def __mark_seen(self):
+        """Records that the files hold nothing this process has not seen"""
+        FileStorage.__seen = self.__version()
+
+    def __merge(self, always=False):
+        """Folds in what other processes wrote since we last looked
+
+        Objects changed or deleted here since the last write are kept as
+        they are, every other object takes its state on disk. Only done
+        in shared mode, unless always is true.
+        """
+        if not (self.__shared or always) or self.__sharded or \
+                self.__version() == self.__seen:
+            return
+        records = self.__read()
+        with self.__lock:
+            FileStorage.__generation += 1
+            if self.__unloaded:
+                # Records not built yet are read again when needed
+                FileStorage.__raw = None
+            for key, record in records.items():
+                obj = self.__objects.get(key)
+                if key in self.__deleted or obj in self.__dirty:
+                    continue
+                if record is None:
+                    if self.__unregister(key) is not None:
+                        self.__cache.pop(key, None)
+                elif obj is not None and record != obj.to_dict():
+                    self.__register(key, self.__build(record))
+                elif obj is None and not self.__unloaded:
+                    self.__register(key, self.__build(record))
+            for key, obj in list(self.__objects.items()):
+                # Saved here once, then deleted by another process
+                if key not in records and obj not in self.__dirty:
+                    self.__unregister(key)
+                    self.__cache.pop(key, None)
+        self.__mark_seen()
+
+    def __dump(self, items, dirty):
+        """Returns the snapshot bytes of the (key, object) pairs in items"""
+        if not self.__dumped:
+            # The first snapshot of the process, and maybe its only one
+            FileStorage.__dumped = True
+            return snapshot.dumps({key: value.to_dict()
+                                   for key, value in items}, self.__format)
 
-        # iterate over each key-value pair in __objects
-        # and convert the object to a dictionary
-        for key, value in self.__objects.items():
-            serialized_objects[key] = value.to_dict()
+        # Reuse the cached JSON text (or dictionary, in the other
+        # formats) of every unchanged object and only serialize the
+        # objects that were touched since
+        as_json = self.__format == 'json'
+        fragments = []
+        for key, value in items:
+            cached = self.__cache.get(key)
+            if cached is None or cached[0] is not value or value in dirty:
+                serialized = value.to_dict()
+                if as_json:
+                    serialized = self.__encode(key, serialized)
+                cached = (value, serialized)
+                self.__cache[key] = cached
+            fragments.append(cached[1])
 
-        # Open the __file_path and serialize the serialized
-        # objects to JSON and store in the file
-        with open(self.__file_path, 'w', encoding='utf-8') as file:
-            json.dump(serialized_objects, file, indent=4)
+        if not as_json:
+            records = {key: fragment
+                       for (key, _), fragment in zip(items, fragments)}
+            return snapshot.dumps(records, self.__format)
+        # Same layout as json.dump(serialized_objects, file, indent=4)
+        if not fragments:
+            return b'{}'
+        text = '{\n    ' + ',\n    '.join(fragments) + '\n}'
+        return text.encode('utf-8')
+
+    def __take_changes(self, with_items):
+        """Hands the pending changes over to a writer
+
+        Objects changed while the writer works are recorded afresh.
+
+        Returns:
+            the dirty objects, the deleted keys and, if with_items is
+            true, a list of the (key, object) pairs of __objects.
+        """
+        with self.__lock:
+            dirty = self.__dirty
+            FileStorage.__dirty = weakref.WeakSet()
+            deleted = set(self.__deleted)
+            self.__deleted.clear()
+            items = list(self.__objects.items()) if with_items else None
+        return dirty, deleted, items
+
+    def __give_back(self, dirty, deleted):
+        """Records again the changes a failed write took over"""
+        with self.__lock:
+            self.__dirty.update(dirty)
+            self.__deleted.update(deleted - set(self.__objects))
+
+    @staticmethod
+    def __write_atomically(path, data):
+        """Replaces the file at path with data, never leaving it truncated
+
+        The data goes to a temporary file in the same directory which is
+        then renamed over path. The name of the temporary file is unique
+        to the writing thread, and it is created with the usual
+        permissions of new files.
+        """
+        temporary = '{}.{}.{}.tmp'.format(path, os.getpid(),
+                                          threading.get_ident())
+        descriptor = os.open(temporary,
+                             os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def start_writer(self, interval=1.0, threshold=100):
+        """Moves saving to a background thread
+
+        `save()` then returns at once and the thread writes the pending
+        changes every interval seconds, or as soon as threshold saves
+        were asked for. `flush()` writes them right away and `close()`
+        stops the thread after a last write.
+
+        When a write of the thread fails its changes stay pending and the
+        error is raised by the next `save()` or `close()`.
+        """
+        if self.__writer is not None:
+            return
+        FileStorage.__interval = interval
+        FileStorage.__threshold = threshold
+        FileStorage.__stopping = False
+        writer = threading.Thread(target=self.__write_behind,
+                                  name="FileStorage writer", daemon=True)
+        FileStorage.__writer = writer
+        writer.start()
+        atexit.register(self.close)
+
+    def __write_behind(self):
+        """Body of the writer thread"""
+        while True:
+            with self.__wakeup:
+                if not self.__stopping and \
+                        self.__changes < self.__threshold:
+                    self.__wakeup.wait(self.__interval)
+                stopping = self.__stopping
+                changes = self.__changes
+            if changes:
+                try:
+                    self.flush()
+                except Exception as error:
+                    # Raised by the next save() or close(), the changes
+                    # are written again on the next round
+                    with self.__wakeup:
+                        FileStorage.__error = error
+                        FileStorage.__changes = max(self.__changes, 1)
+                else:
+                    with self.__wakeup:
+                        FileStorage.__error = None
+            if stopping:
+                return
+
+    def close(self):
+        """Stops the writer thread, if any, and writes pending changes"""
+        writer = self.__writer
+        if writer is not None:
+            with self.__wakeup:
+                FileStorage.__stopping = True
+                self.__wakeup.notify()
+            writer.join()
+            FileStorage.__writer = None
+        error = self.__error
+        FileStorage.__error = None
+        if self.__changes or self._deferred:
+            FileStorage._deferred = False
+            self.flush()
+        elif error is not None:
+            raise error
+
+    @staticmethod
+    def __encode(key, dictionary):
+        """Returns the indented JSON text of one `key: dictionary` entry"""
+        text = json.dumps(dictionary, indent=4).replace('\n', '\n    ')
+        return json.dumps(key) + ': ' + text
 
     def reload(self):
-        """Deserializes the JSON file to __objects"""
+        """Deserializes the JSON file to __objects
+
+        In lazy mode the file is only read once objects are asked for.
+        """
+        # Loaded again on the next search, from the files read now
+        FileStorage.__texts = None
+        FileStorage.__orders = {}
+        FileStorage.__generation += 1
+        if self.__lazy or self.__sharded:
+            FileStorage.__unloaded = True
+            FileStorage.__raw = None
+            self.__shards.clear()
+            self.__mark_seen()
+            return
+
+        with self.__writing, self.__locked(exclusive=False):
+            records = self.__read()
+            self.__mark_seen()
+        with self.__lock:
+            for key, record in records.items():
+                if record is None:
+                    self.__unregister(key)
+                else:
+                    # Recreate the object and store it in __objects
+                    self.__register(key, self.__build(record))
+
+            # Freshly loaded objects match what is on disk
+            self.__deleted.clear()
+            self.__dirty.clear()
+
+    def __read(self):
+        """Returns the records of the snapshot and the journal
+
+        Returns:
+            a dictionary of className.id keys to serialized objects,
+            or to None for objects the journal deleted.
+        """
+        records = {}
         # Check if the JSON file exists
         if os.path.exists(self.__file_path):
-            # Open the JSON file in read mode with utf-8 encoding
-            with open(self.__file_path, encoding='utf-8') as file:
-                loaded_dictionary = json.load(file)
-            # Iterate over each key-value pair in the loaded dictionary
-            for key, value in loaded_dictionary.items():
-                cls = eval(value["__class__"])
-                obj = cls(**value)
-                # Recreate the object and store it in __objects dictionary
-                self.__objects[key] = obj
-        else:
-            # If the file does not exist, do nothing
-            pass
+            # Snapshots in any format are recognized by their content
+            with open(self.__file_path, 'rb') as file:
+                records.update(snapshot.loads(file.read()))
+
+        # Replay the journal written since the last snapshot
+        if os.path.isfile(self.journal_path()):
+            with open(self.journal_path(), encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn line from an interrupted append
+                        continue
+                    if record[0] == "del":
+                        records[record[1]] = None
+                    else:
+                        records[record[1]] = record[2]
+        return records
+
+    @staticmethod
+    def __build(record):
+        """Recreates an unchanged object from its serialized form"""
+        return classes[record["__class__"]](**record)
+
+    def __materialize(self, cls=None):
+        """Builds the objects a lazy reload left on disk
+
+        Args:
+            cls: a class name to build the objects of that class only.
+        """
+        if not self.__unloaded:
+            return
+        with self.__lock:
+            self.__load(cls)
+
+    def __load(self, cls):
+        """Body of __materialize, run under the storage lock"""
+        if not self.__unloaded:
+            return
+        if self.__sharded:
+            self.__load_shards(cls)
+            return
+        if self.__raw is None:
+            # Group the records by class, the first time only
+            raw = {}
+            for key, record in self.__read().items():
+                if record is not None:
+                    raw.setdefault(key.split('.')[0], {})[key] = record
+            FileStorage.__raw = raw
+
+        names = [cls] if cls is not None else list(self.__raw)
+        for name in names:
+            for key, record in self.__raw.pop(name, {}).items():
+                # Objects created or fetched since the reload are newer
+                if key not in self.__objects and key not in self.__deleted:
+                    self.__register(key, self.__build(record))
+        if not self.__raw:
+            FileStorage.__unloaded = False
+            FileStorage.__raw = None
+
+    def __load_shards(self, cls):
+        """Builds the objects of the class files not read yet"""
+        names = [cls] if cls is not None else self.__shard_names()
+        for name in names:
+            if name in self.__shards:
+                continue
+            self.__shards.add(name)
+            path = self.shard_path(name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as file:
+                records = snapshot.loads(file.read())
+            for key, record in records.items():
+                # Objects created since the reload are newer
+                if key not in self.__objects and key not in self.__deleted:
+                    self.__register(key, self.__build(record))
+        if cls is None:
+            FileStorage.__unloaded = False
+
+    def __shard_names(self):
+        """Returns the names of the classes that have a file"""
+        directory = os.path.dirname(self.shard_path(''))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.json')] for name in os.listdir(directory)
+                      if name.endswith('.json'))
+
+    def __forget(self, key):
+        """Drops the unbuilt record of key, the copy in memory is newer"""
+        if self.__raw is not None:
+            self.__raw.get(key.split('.')[0], {}).pop(key, None)
+
+    def __find(self, key):
+        """Returns the stored record of key without loading the others"""
+        if self.__raw is not None:
+            return self.__raw.get(key.split('.')[0], {}).pop(key, None)
+        if key in self.__deleted:
+            return None
+
+        # The latest journal record of key wins over the snapshot
+        encoded = json.dumps(key)
+        if os.path.isfile(self.journal_path()):
+            with open(self.journal_path(), encoding='utf-8') as file:
+                lines = [line for line in file if encoded in line]
+            for line in reversed(lines):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record[1] == key:
+                    return None if record[0] == "del" else record[2]
+
+        if not os.path.exists(self.__file_path):
+            return None
+        with open(self.__file_path, 'rb') as file:
+            magic = file.read(len(snapshot.INDEXED_MAGIC))
+            if magic == snapshot.INDEXED_MAGIC:
+                # Only the probed slots and the record are paged in
+                with mmap.mmap(file.fileno(), 0,
+                               access=mmap.ACCESS_READ) as data:
+                    return snapshot.lookup(data, key)
+            data = magic + file.read()
+        if data.startswith(snapshot.MAGIC):
+            return snapshot.loads(data).get(key)
+        text = data.decode('utf-8')
+        # Top-level keys are the only ones indented by four spaces
+        start = text.find('\n    ' + encoded + ': {')
+        if start < 0:
+            # Not our own indented layout, fall back to a full parse
+            if encoded not in text:
+                return None
+            return json.loads(text).get(key)
+        start = text.index('{', start)
+        return json.JSONDecoder().raw_decode(text, start)[0]
@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+"""
+Module: fulltext.py
+
+Defines the `TextIndex` inverted index `FileStorage` keeps over the
+attributes the models list in `text_attributes`, see
+`FileStorage.search()`.
+
+A query is a list of words that must all appear in a matching object,
+and `OR` between words separates alternatives:
+
+    pool wifi           objects with both pool and wifi
+    pool OR beach       objects with pool, beach or both
+    pool wifi OR beach  objects with both pool and wifi, or with beach
+
+Matches are ranked with BM25.
+"""
+import heapq
+import math
+import re
+
+WORD = re.compile(r"\w+")
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """Returns the lowercase words of text"""
+    return WORD.findall(text.lower())
+
+
+def parse(query):
+    """Returns the alternatives of a query, each a list of words"""
+    alternatives = [[]]
+    for word in query.split():
+        if word == "OR":
+            alternatives.append([])
+        else:
+            alternatives[-1].extend(tokenize(word))
+    return [words for words in alternatives if words]
+
+
+class TextIndex:
+    """Posting lists of the words of a set of documents
+
+    `postings` maps every word to the keys of the documents holding it
+    and how many times they do, and `documents` maps every key to its
+    words, so a document can be taken out without its text.
+    """
+
+    def __init__(self, postings=None):
+        """Creates an index, from saved postings if any"""
+        self.postings = {}
+        self.documents = {}
+        self.lengths = {}
+        self.total = 0
+        for word, keys in (postings or {}).items():
+            self.postings[word] = dict(keys)
+            for key, count in keys.items():
+                self.documents.setdefault(key, {})[word] = count
+        for key, words in self.documents.items():
+            self.lengths[key] = sum(words.values())
+            self.total += self.lengths[key]
+
+    def add(self, key, texts):
+        """Indexes the words of texts under key, replacing its old ones"""
+        self.remove(key)
+        words = {}
+        for text in texts:
+            if isinstance(text, str):
+                for word in tokenize(text):
+                    words[word] = words.get(word, 0) + 1
+        if not words:
+            return
+        self.documents[key] = words
+        self.lengths[key] = sum(words.values())
+        self.total += self.lengths[key]
+        for word, count in words.items():
+            self.postings.setdefault(word, {})[key] = count
+
+    def remove(self, key):
+        """Takes the document of key out of the index"""
+        words = self.documents.pop(key, None)
+        if words is None:
+            return
+        self.total -= self.lengths.pop(key)
+        for word in words:
+            keys = self.postings[word]
+            del keys[key]
+            if not keys:
+                del self.postings[word]
+
+    def scores(self, query):
+        """Returns the BM25 score of every key matching query
+
+        A key matching several alternatives adds up their scores.
+
+        Each alternative starts from the shortest posting list of its
+        words and only looks the others up, so the cost follows the
+        sizes of the posting lists rather than the number of documents.
+        """
+        scores = {}
+        for words in parse(query):
+            lists = [self.postings.get(word) for word in set(words)]
+            if not all(lists):
+                continue
+            lists.sort(key=len)
+            matches = [key for key in lists[0]
+                       if all(key in keys for keys in lists[1:])]
+            for key in matches:
+                score = sum(self.weight(keys, key) for keys in lists)
+                scores[key] = scores.get(key, 0.0) + score
+        return scores
+
+    def weight(self, keys, key):
+        """Returns the BM25 weight of one word in the document of key
+
+        Args:
+            keys: the posting list of the word.
+            key: a key in keys.
+        """
+        count = len(self.documents)
+        idf = math.log(1 + (count - len(keys) + 0.5) / (len(keys) + 0.5))
+        frequency = keys[key]
+        average = self.total / count
+        norm = K1 * (1 - B + B * self.lengths[key] / average)
+        return idf * frequency * (K1 + 1) / (frequency + norm)
+
+
+def best(scores, limit=None):
+    """Returns the (score, key) pairs of scores, best first
+
+    Args:
+        scores: a dictionary of keys to scores.
+        limit: the largest number of pairs to return.
+    """
+    pairs = ((score, key) for key, score in scores.items())
+    if limit is not None:
+        return heapq.nlargest(limit, pairs, key=lambda item: item[0])
+    return sorted(pairs, key=lambda item: -item[0])
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""
+Module: ranges.py
+
+Defines the `SortedIndex` `FileStorage` keeps on the attributes the
+models list in `sorted_attributes`, see `FileStorage.select()`.
+"""
+import bisect
+from datetime import datetime
+from operator import itemgetter
+
+VALUE = itemgetter(0)
+
+
+def parse_range(text):
+    """Returns the (low, high) bounds of a `low..high` range
+
+    Bounds are numbers or ISO dates without a time zone, like the
+    timestamps of the models, and an empty one is None, for an open end.
+
+    Raises:
+        ValueError: when a bound is neither a number nor such a date.
+    """
+    low, dots, high = text.partition("..")
+    if not dots:
+        raise ValueError("not a range: {}".format(text))
+    return _bound(low), _bound(high)
+
+
+def _bound(text):
+    """Returns one bound of a range, or None if it is empty"""
+    if not text:
+        return None
+    for convert in (int, float, datetime.fromisoformat):
+        try:
+            value = convert(text)
+        except ValueError:
+            continue
+        # Aware datetimes cannot be compared with naive ones
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            break
+        return value
+    raise ValueError("invalid bound: {}".format(text))
+
+
+def kind(value):
+    """Returns the type a value is ordered as, or None if unordered"""
+    if isinstance(value, datetime):
+        return datetime
+    if isinstance(value, (int, float)) and value == value:
+        # Not NaN, which compares false with everything
+        return float
+    return None
+
+
+class SortedIndex:
+    """The (value, key) pairs of one attribute in ascending order
+
+    Only values of one kind are kept, numbers or datetimes, whichever
+    came first, since they cannot be compared with each other. Objects
+    holding anything else are left out and never match a range.
+    """
+
+    def __init__(self, pairs=()):
+        """Creates an index of (key, value) pairs, sorted once"""
+        self.entries = []
+        self.values = {}
+        self.kind = None
+        for key, value in pairs:
+            if self.accepts(value):
+                self.entries.append((value, key))
+                self.values[key] = value
+        self.entries.sort()
+
+    def accepts(self, value):
+        """Tells if value can be ordered with the values of the index"""
+        value_kind = kind(value)
+        if value_kind is None:
+            return False
+        if self.kind is None:
+            self.kind = value_kind
+        return value_kind is self.kind
+
+    def add(self, key, value):
+        """Puts key at value, replacing its old position"""
+        self.remove(key)
+        if not self.accepts(value):
+            return
+        bisect.insort(self.entries, (value, key))
+        self.values[key] = value
+
+    def remove(self, key):
+        """Takes key out of the index"""
+        if key not in self.values:
+            return
+        entry = (self.values.pop(key), key)
+        del self.entries[bisect.bisect_left(self.entries, entry)]
+
+    def bounds(self, low=None, high=None):
+        """Returns the slice of entries with low <= value <= high
+
+        Either end may be None for an open range.
+        """
+        start = 0 if low is None else \
+            bisect.bisect_left(self.entries, low, key=VALUE)
+        stop = len(self.entries) if high is None else \
+            bisect.bisect_right(self.entries, high, key=VALUE)
+        return start, max(start, stop)
+
+    def keys(self, low=None, high=None, descending=False):
+        """Yields the keys with low <= value <= high in value order"""
+        start, stop = self.bounds(low, high)
+        if descending:
+            for position in range(stop - 1, start - 1, -1):
+                yield self.entries[position][1]
+        else:
+            for position in range(start, stop):
+                yield self.entries[position][1]
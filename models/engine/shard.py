@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+"""
+Module: shard.py
+
+Moves a `FileStorage` snapshot to the one-file-per-class layout of
+sharded storage, or back.
+
+Usage:
+
+    $ python3 -m models.engine.shard split file.json file.json.d
+    $ python3 -m models.engine.shard join file.json.d file.json [FORMAT]
+"""
+import sys
+from models.engine import snapshot
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (4, 5) or \
+            sys.argv[1] not in ("split", "join") or \
+            sys.argv[4:] and sys.argv[4] not in snapshot.FORMATS:
+        print("Usage: {} split|join SOURCE DESTINATION [{{{}}}]".format(
+            sys.argv[0], "|".join(snapshot.FORMATS)))
+        sys.exit(1)
+    action = getattr(snapshot, sys.argv[1])
+    action(sys.argv[2], sys.argv[3], *sys.argv[4:])
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+"""
+Module: snapshot.py
+
+Defines the snapshot formats `FileStorage` can write its objects in.
+
+    json      the indented JSON document of className.id keys to
+              serialized objects that the project always used.
+    columnar  records grouped by class, with one list of column names
+              per class instead of repeated keys, and the whole document
+              compressed at the fastest zlib level. Values are stored as
+              they are, so that reading one costs little more than
+              reading the JSON document.
+    indexed   one JSON line per record after a hash table of key hashes
+              to record offsets, so that `lookup()` can decode a single
+              record of a memory-mapped file without reading the rest.
+
+All three formats hold the same records, `loads()` recognizes any of
+them and `convert()` rewrites a file from one format to another, see
+`models.engine.convert` for the command line. `split()` and `join()`
+move records between a single file and the one-file-per-class layout
+of sharded storage, see `models.engine.shard`.
+"""
+import hashlib
+import json
+import os
+import struct
+import zlib
+
+MAGIC = b'HBNB\x01'
+INDEXED_MAGIC = b'HBNB\x02'
+# Magic, number of slots of the hash table
+INDEXED_HEADER = struct.Struct('<5sQ')
+# Key hash, offset and length of the record, or zeros for a free slot
+INDEXED_SLOT = struct.Struct('<QQQ')
+# Compressing harder saves little on this kind of document, for a few
+# times the time
+COMPRESSION = 1
+
+
+def dumps(records, format='json'):
+    """Returns the bytes of a snapshot of records
+
+    Args:
+        records: a dictionary of className.id keys to serialized objects.
+        format: the name of the snapshot format, see `FORMATS`.
+    """
+    return FORMATS[format][0](records)
+
+
+def loads(data):
+    """Returns the records held by a snapshot in any format"""
+    if isinstance(data, bytes) and data.startswith(MAGIC):
+        return _load_columnar(data)
+    if isinstance(data, bytes) and data.startswith(INDEXED_MAGIC):
+        return _load_indexed(data)
+    return _load_json(data)
+
+
+def lookup(data, key):
+    """Returns the record of key in an indexed snapshot, or None
+
+    Only the hash table slots probed and the record itself are read, so
+    data is best a `mmap` of the snapshot file.
+    """
+    _, slots = INDEXED_HEADER.unpack_from(data)
+    if not slots:
+        return None
+    hashed = _hash_key(key)
+    slot = hashed % slots
+    while True:
+        position = INDEXED_HEADER.size + slot * INDEXED_SLOT.size
+        found, offset, length = INDEXED_SLOT.unpack_from(data, position)
+        if not offset:
+            return None
+        if found == hashed:
+            stored, record = json.loads(data[offset:offset + length])
+            if stored == key:
+                return record
+        slot = (slot + 1) % slots
+
+
+def _dump_json(records):
+    """Encodes records as the indented JSON document"""
+    return json.dumps(records, indent=4).encode('utf-8')
+
+
+def _load_json(data):
+    """Decodes the indented JSON document"""
+    return json.loads(data)
+
+
+def _dump_columnar(records):
+    """Encodes records grouped by class in column order"""
+    classes = {}
+    for key, record in records.items():
+        name = record["__class__"]
+        table = classes.setdefault(name, {"columns": [], "positions": {},
+                                          "rows": [], "missing": {},
+                                          "keys": {}})
+        positions = table["positions"]
+        for column in record:
+            if column != "__class__" and column not in positions:
+                positions[column] = len(table["columns"])
+                table["columns"].append(column)
+
+    absent = object()
+    for key, record in records.items():
+        table = classes[record["__class__"]]
+        number = len(table["rows"])
+        row = [record.get(column, absent) for column in table["columns"]]
+        if absent in row:
+            missing = [position for position, value in enumerate(row)
+                       if value is absent]
+            for position in missing:
+                row[position] = None
+            table["missing"][number] = missing
+        table["rows"].append(row)
+        # Keys are rebuilt from the class and id unless they differ
+        if key != "{}.{}".format(record["__class__"], record.get("id")):
+            table["keys"][number] = key
+
+    for table in classes.values():
+        del table["positions"]
+    document = json.dumps(classes, separators=(',', ':'))
+    return MAGIC + zlib.compress(document.encode('utf-8'), COMPRESSION)
+
+
+def _load_columnar(data):
+    """Decodes records written by _dump_columnar"""
+    classes = json.loads(zlib.decompress(data[len(MAGIC):]))
+    records = {}
+    for name, table in classes.items():
+        columns = table["columns"] + ["__class__"]
+        missing = table["missing"]
+        keys = table["keys"]
+        prefix = name + "."
+        for number, row in enumerate(table["rows"]):
+            row.append(name)
+            record = dict(zip(columns, row))
+            if missing and str(number) in missing:
+                for position in missing[str(number)]:
+                    del record[columns[position]]
+            key = keys.get(str(number)) if keys else None
+            if key is None:
+                key = prefix + str(record.get("id"))
+            records[key] = record
+    return records
+
+
+def _hash_key(key):
+    """Returns a 64-bit hash of key that is the same in every process"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _dump_indexed(records):
+    """Encodes records as JSON lines behind a hash table of offsets"""
+    # Half-full at most, so that probes stay short
+    slots = 2 * len(records)
+    offset = INDEXED_HEADER.size + slots * INDEXED_SLOT.size
+    table = [None] * slots
+    lines = []
+    for key, record in records.items():
+        line = json.dumps([key, record], separators=(',', ':'))
+        line = line.encode('utf-8') + b'\n'
+        hashed = _hash_key(key)
+        slot = hashed % slots
+        while table[slot] is not None:
+            slot = (slot + 1) % slots
+        table[slot] = (hashed, offset, len(line) - 1)
+        lines.append(line)
+        offset += len(line)
+
+    parts = [INDEXED_HEADER.pack(INDEXED_MAGIC, slots)]
+    parts += [INDEXED_SLOT.pack(*(entry or (0, 0, 0))) for entry in table]
+    return b''.join(parts + lines)
+
+
+def _load_indexed(data):
+    """Decodes every record of an indexed snapshot, in their order"""
+    _, slots = INDEXED_HEADER.unpack_from(data)
+    start = INDEXED_HEADER.size + slots * INDEXED_SLOT.size
+    records = {}
+    for line in data[start:].splitlines():
+        key, record = json.loads(line)
+        records[key] = record
+    return records
+
+
+def convert(source, destination, format):
+    """Rewrites the snapshot at source in format at destination"""
+    with open(source, 'rb') as file:
+        records = loads(file.read())
+    with open(destination, 'wb') as file:
+        file.write(dumps(records, format))
+
+
+def split(source, directory, format='json'):
+    """Writes the records of the snapshot at source to one file per class
+
+    The records of class `Name` go to `Name.json` in directory.
+    """
+    with open(source, 'rb') as file:
+        records = loads(file.read())
+    classes = {}
+    for key, record in records.items():
+        classes.setdefault(key.split('.')[0], {})[key] = record
+    os.makedirs(directory, exist_ok=True)
+    for name, shard in classes.items():
+        with open(os.path.join(directory, name + '.json'), 'wb') as file:
+            file.write(dumps(shard, format))
+
+
+def join(directory, destination, format='json'):
+    """Writes the records of the class files in directory to one file"""
+    records = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), 'rb') as file:
+                records.update(loads(file.read()))
+    with open(destination, 'wb') as file:
+        file.write(dumps(records, format))
+
+
+FORMATS = {
+    "json": (_dump_json, _load_json),
+    "columnar": (_dump_columnar, _load_columnar),
+    "indexed": (_dump_indexed, _load_indexed),
+}
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+"""
+Module: spatial.py
+
+Defines the `Grid` index `FileStorage` keeps over the coordinates of the
+models that declare `spatial_attributes`, see `FileStorage.near()` and
+`FileStorage.within()`.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    """Returns the great-circle distance between two points in km"""
+    phi = math.radians(latitude)
+    other_phi = math.radians(other_latitude)
+    half_dphi = (other_phi - phi) / 2
+    half_dlambda = math.radians(other_longitude - longitude) / 2
+    a = math.sin(half_dphi) ** 2 + \
+        math.cos(phi) * math.cos(other_phi) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def coordinates(latitude, longitude):
+    """Returns (latitude, longitude) as floats, or None if invalid"""
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not -90 <= latitude <= 90 or not math.isfinite(longitude):
+        return None
+    return latitude, (longitude + 180) % 360 - 180
+
+
+class Grid:
+    """Objects bucketed by cells of size x size degrees
+
+    Each cell maps the keys of its objects to (object, latitude,
+    longitude), so queries filter candidates without reading their
+    attributes again.
+    """
+
+    def __init__(self, size=0.1):
+        """Creates an empty grid of size-degree cells"""
+        self.size = size
+        self.columns = round(360 / size)
+        self.cells = {}
+        self.where = {}
+
+    def cell(self, latitude, longitude):
+        """Returns the cell holding a valid point"""
+        row = min(int((latitude + 90) / self.size), round(180 / self.size))
+        column = int((longitude + 180) / self.size) % self.columns
+        return row, column
+
+    def add(self, key, obj, latitude, longitude):
+        """Puts obj at a point, or only removes it if the point is invalid"""
+        self.remove(key)
+        point = coordinates(latitude, longitude)
+        if point is None:
+            return
+        cell = self.cell(*point)
+        self.cells.setdefault(cell, {})[key] = (obj,) + point
+        self.where[key] = cell
+
+    def remove(self, key):
+        """Takes the object of key out of the grid"""
+        cell = self.where.pop(key, None)
+        if cell is not None:
+            bucket = self.cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self.cells[cell]
+
+    def box(self, south, west, north, east):
+        """Returns the (key, object, latitude, longitude) of a box
+
+        The box spans the antimeridian when west is greater than east.
+        """
+        if east - west >= 360:
+            west, east = -180, 180
+        else:
+            west = (west + 180) % 360 - 180
+            east = (east + 180) % 360 - 180
+        first, left = self.cell(max(south, -90), west)
+        last, right = self.cell(min(north, 90), min(east, 180 - 1e-9))
+        if west <= east:
+            columns = range(left, right + 1)
+            spans = [(west, east)]
+        else:
+            columns = list(range(left, self.columns)) + \
+                list(range(0, right + 1))
+            spans = [(west, 180), (-180, east)]
+
+        if (last - first + 1) * len(columns) > len(self.cells):
+            # Fewer cells are filled than the box covers
+            wanted = set(columns)
+            cells = [cell for cell in self.cells
+                     if first <= cell[0] <= last and cell[1] in wanted]
+        else:
+            cells = [(row, column) for row in range(first, last + 1)
+                     for column in columns if (row, column) in self.cells]
+
+        found = []
+        for cell in cells:
+            for key, (obj, latitude, longitude) in self.cells[cell].items():
+                if south <= latitude <= north and \
+                        any(low <= longitude <= high
+                            for low, high in spans):
+                    found.append((key, obj, latitude, longitude))
+        return found
+
+    def near(self, latitude, longitude, radius_km):
+        """Returns (distance, key, object) within radius_km, nearest first"""
+        span = radius_km / KM_PER_DEGREE
+        south = latitude - span
+        north = latitude + span
+        polar = max(abs(south), abs(north))
+        if polar >= 90 or span >= 180:
+            # The circle reaches a pole: every longitude is in range
+            west, east = -180, 180
+        else:
+            width = span / math.cos(math.radians(polar))
+            if width >= 180:
+                west, east = -180, 180
+            else:
+                west, east = longitude - width, longitude + width
+
+        found = []
+        for key, obj, other_latitude, other_longitude in self.box(
+                south, west, north, east):
+            distance = distance_km(latitude, longitude,
+                                   other_latitude, other_longitude)
+            if distance <= radius_km:
+                found.append((distance, key, obj))
+        found.sort(key=lambda item: item[0])
+        return found
@@ -0,0 +1,317 @@
+#!/usr/bin/python3
+"""
+Module: sqlite_storage.py
+
+Defines a `SQLiteStorage` class.
+"""
+import json
+import sqlite3
+import threading
+import weakref
+from models.engine.batching import Batching
+from models.base_model import BaseModel, classes
+from models.user import User
+from models.state import State
+from models.review import Review
+from models.place import Place
+from models.city import City
+from models.amenity import Amenity
+
+
+class SQLiteStorage(Batching):
+    """Stores the objects in an SQLite database, one table per class
+
+    It offers the interface of `FileStorage`, so models and the console
+    work with either one, see `models/__init__.py` for how it is chosen.
+
+    Every table has the id and timestamps of its objects, one column per
+    attribute the class lists in `indexed_attributes`, each with an index
+    so that `filter()` on a foreign key is answered by SQLite, and the
+    whole serialized object in a `data` column.
+
+    Objects are only read from the database when they are asked for, and
+    the storage only keeps weak references to the objects it returned,
+    plus the objects changed since the last save, so the dataset is not
+    limited by memory. A save writes the changed rows and nothing else,
+    and the saves of a `batch()` block are written in one transaction
+    on exit.
+    """
+    __file_path = 'file.db'
+    __classes = classes
+    __tables = set()
+    __connection = None
+    __objects = weakref.WeakValueDictionary()
+    __dirty = {}
+    __deleted = set()
+    __lock = threading.RLock()
+
+    def all(self, cls=None):
+        """Returns a dictionary of className.id keys to objects
+
+        Args:
+            cls: a class or class name. When given, only the objects of
+                that class are returned.
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        names = [cls] if cls is not None else list(self.__classes)
+        objects = {}
+        with self.__lock:
+            for name in names:
+                if not self.__known(name):
+                    continue
+                rows = self.__execute(
+                    'SELECT data FROM "{}" ORDER BY rowid'.format(name))
+                objects.update(self.__load(name, rows))
+                # Objects not saved yet
+                objects.update(self.__pending(name))
+        return objects
+
+    def get(self, cls, id):
+        """Returns the object of class cls with the given id, or None"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        key = "{}.{}".format(cls, id)
+        with self.__lock:
+            obj = self.__objects.get(key)
+            if obj is not None or key in self.__deleted or \
+                    not self.__known(cls):
+                return obj
+            rows = self.__execute(
+                'SELECT data FROM "{}" WHERE id = ?'.format(cls), (id,))
+            return self.__load(cls, rows).get(key)
+
+    def filter(self, cls, **criteria):
+        """Returns the objects of cls whose attributes equal criteria
+
+        Criteria on the id, the timestamps or the indexed attributes of
+        cls are handed to SQLite, the others are checked on the objects.
+
+        Example: storage.filter(Review, place_id=place.id)
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if not self.__known(cls):
+            return {}
+        columns = self.__columns(self.__classes[cls])
+        clauses = []
+        parameters = []
+        for name, value in criteria.items():
+            if name in columns:
+                clauses.append('"{}" = ?'.format(name))
+                parameters.append(self.__column_value(value))
+        query = 'SELECT data FROM "{}"'.format(cls)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+
+        with self.__lock:
+            candidates = self.__load(
+                cls, self.__execute(query + ' ORDER BY rowid', parameters))
+            candidates.update(self.__pending(cls))
+        return {key: obj for key, obj in candidates.items()
+                if all(getattr(obj, name, None) == value
+                       for name, value in criteria.items())}
+
+    def count(self, cls=None):
+        """Returns the number of objects, optionally of one class only"""
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        names = [cls] if cls is not None else list(self.__classes)
+        with self.__lock:
+            if self.__dirty or self.__deleted:
+                # Unsaved changes are only known to the objects
+                return len(self.all(cls))
+            return sum(self.__execute(
+                'SELECT COUNT(*) FROM "{}"'.format(name)).fetchone()[0]
+                for name in names if self.__known(name))
+
+    def new(self, obj):
+        """Adds obj to the objects written by the next save"""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self.__lock:
+            self.__objects[key] = obj
+            self.__deleted.discard(key)
+            self.__dirty[id(obj)] = obj
+
+    def delete(self, obj=None):
+        """Removes obj from the database on the next save"""
+        if obj is None:
+            return
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        with self.__lock:
+            if self.__objects.get(key) is obj:
+                del self.__objects[key]
+            self.__dirty.pop(id(obj), None)
+            self.__deleted.add(key)
+
+    def touch(self, obj, name=None, old=None):
+        """Marks obj as changed since the last save"""
+        with self.__lock:
+            self.__dirty[id(obj)] = obj
+
+    def save(self):
+        """Writes the rows of the objects changed since the last save"""
+        if self._defer():
+            return
+        with self.__lock, self.__connect():
+            for key in self.__deleted:
+                name, object_id = key.split('.', 1)
+                if self.__known(name):
+                    self.__execute('DELETE FROM "{}" WHERE id = ?'.format(
+                        name), (object_id,))
+            for obj in self.__dirty.values():
+                name = obj.__class__.__name__
+                key = "{}.{}".format(name, getattr(obj, "id", None))
+                # Objects that were never added with new() are not stored
+                if self.__objects.get(key) is obj and self.__known(name):
+                    self.__write(obj)
+            self.__deleted.clear()
+            self.__dirty.clear()
+
+    def flush(self):
+        """Writes every change made since the last save now"""
+        self.save()
+
+    def close(self):
+        """Writes pending changes and closes the database"""
+        if self.__connection is None:
+            return
+        if self.__dirty or self.__deleted or self._deferred:
+            self.flush()
+        self.__connection.close()
+        SQLiteStorage.__connection = None
+
+    def reload(self):
+        """Opens the database, creating the missing tables
+
+        Objects are read from it when they are asked for.
+        """
+        with self.__lock:
+            self.__connect()
+            self.__objects.clear()
+            self.__dirty.clear()
+            self.__deleted.clear()
+
+    def reset(self, file_path='file.db'):
+        """Closes the database and forgets every object and pending
+        change, without writing anything
+
+        The state of the storage lives in the class, so this is how tests
+        start from a clean storage, as with `FileStorage.reset()`.
+
+        Args:
+            file_path: the database file to use from now on.
+        """
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+            SQLiteStorage.__connection = None
+            SQLiteStorage.__file_path = file_path
+            SQLiteStorage.__tables = set()
+            SQLiteStorage.__objects = weakref.WeakValueDictionary()
+            SQLiteStorage.__dirty = {}
+            SQLiteStorage.__deleted = set()
+            SQLiteStorage._batch_depth = 0
+            SQLiteStorage._deferred = False
+
+    def __connect(self):
+        """Returns the database connection, opening it on first use"""
+        if self.__connection is None:
+            connection = sqlite3.connect(self.__file_path,
+                                         check_same_thread=False)
+            SQLiteStorage.__connection = connection
+            self.__tables.clear()
+            with connection:
+                for name, cls in list(self.__classes.items()):
+                    self.__create_table(name, cls)
+        return self.__connection
+
+    def __known(self, name):
+        """Tells if name is a model class, creating its table if needed
+
+        Tables are created the first time their class is used, so model
+        classes defined after the database was opened are stored too.
+        """
+        cls = self.__classes.get(name)
+        if cls is None:
+            return False
+        if name not in self.__tables:
+            with self.__lock, self.__connect():
+                self.__create_table(name, cls)
+        return True
+
+    def __create_table(self, name, cls):
+        """Creates the table of cls and the indexes of its foreign keys"""
+        columns = ['id TEXT PRIMARY KEY', 'created_at TEXT',
+                   'updated_at TEXT']
+        columns += ['"{}"'.format(attribute)
+                    for attribute in cls.indexed_attributes]
+        columns.append('data TEXT NOT NULL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS "{}" ({})'.format(
+                name, ', '.join(columns)))
+        for attribute in cls.indexed_attributes:
+            self.__connection.execute(
+                'CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" ("{1}")'
+                .format(name, attribute))
+        self.__tables.add(name)
+
+    @staticmethod
+    def __columns(cls):
+        """Returns the names of the columns of the table of cls"""
+        return ("id", "created_at", "updated_at") + \
+            tuple(cls.indexed_attributes)
+
+    @staticmethod
+    def __column_value(value):
+        """Returns value as SQLite can store it in a column"""
+        if value is None or isinstance(value, (str, int, float)):
+            return value
+        return json.dumps(value, default=str)
+
+    def __write(self, obj):
+        """Inserts or updates the row of obj, keeping its rowid"""
+        name = obj.__class__.__name__
+        record = obj.to_dict()
+        columns = self.__columns(obj.__class__)
+        values = [self.__column_value(record.get(column))
+                  for column in columns]
+        values.append(json.dumps(record))
+        names = ', '.join('"{}"'.format(column)
+                          for column in columns + ("data",))
+        updates = ', '.join('"{0}" = excluded."{0}"'.format(column)
+                            for column in columns[1:] + ("data",))
+        self.__execute(
+            'INSERT INTO "{}" ({}) VALUES ({}) '
+            'ON CONFLICT(id) DO UPDATE SET {}'.format(
+                name, names, ', '.join('?' * len(values)), updates),
+            values)
+
+    def __execute(self, query, parameters=()):
+        """Runs query on the database"""
+        return self.__connect().execute(query, parameters)
+
+    def __load(self, name, rows):
+        """Returns the objects of rows of the table of class name
+
+        Objects already in memory are returned as they are, the others
+        are recreated from their row.
+        """
+        cls = self.__classes[name]
+        objects = {}
+        for data, in rows:
+            record = json.loads(data)
+            key = "{}.{}".format(name, record.get("id"))
+            if key in self.__deleted:
+                continue
+            obj = self.__objects.get(key)
+            if obj is None:
+                obj = cls(**record)
+                self.__objects[key] = obj
+            objects[key] = obj
+        return objects
+
+    def __pending(self, name):
+        """Returns the unsaved objects of class name"""
+        return {key: obj for key, obj in list(self.__objects.items())
+                if key.split('.')[0] == name and id(obj) in self.__dirty}
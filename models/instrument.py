@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+"""The `instrument` module
+
+It times the storage, model and console operations when asked to.
+
+`enable()` replaces every registered function with a wrapper that
+measures each call and hands its name, start time, duration and the
+number of bytes it read or wrote to the sinks:
+
+    - `stats`, the in-memory `Stats` counters, always,
+    - any other object with a `record()` method, such as `TraceFile`,
+      which appends one JSON line per call to a file.
+
+`disable()` puts the original functions back, so instrumentation costs
+nothing while it is off. HBNB_INSTRUMENT=1 turns it on at import, and
+HBNB_TRACE=<path> also writes a trace to path. The console prints the
+counters with its `stats` command.
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+import models
+from models import timestamps
+from models.base_model import BaseModel
+from models.engine import snapshot
+from models.engine.file_storage import FileStorage
+
+
+class Stats:
+    """Sink keeping a count, a cumulative time and bytes per operation"""
+
+    def __init__(self):
+        """Starts with no counters"""
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, started, duration, size):
+        """Adds one call of the operation name"""
+        with self.lock:
+            counter = self.counters.get(name)
+            if counter is None:
+                counter = self.counters[name] = [0, 0.0, 0]
+            counter[0] += 1
+            counter[1] += duration
+            counter[2] += size
+
+    def reset(self):
+        """Drops every counter"""
+        with self.lock:
+            self.counters.clear()
+
+    def report(self):
+        """Returns the counters as a table, slowest operations first"""
+        with self.lock:
+            counters = sorted(self.counters.items(),
+                              key=lambda item: item[1][1], reverse=True)
+        lines = ["{:<28} {:>8} {:>11} {:>10} {:>12}".format(
+            "operation", "calls", "total ms", "mean us", "bytes")]
+        for name, (calls, total, size) in counters:
+            lines.append("{:<28} {:>8} {:>11.2f} {:>10.1f} {:>12}".format(
+                name, calls, total * 1e3, total / calls * 1e6, size))
+        return "\n".join(lines)
+
+
+class TraceFile:
+    """Sink appending one JSON line per call to a file"""
+
+    def __init__(self, path):
+        """Opens path for appending"""
+        self.file = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def record(self, name, started, duration, size):
+        """Writes one call of the operation name"""
+        line = json.dumps({"name": name, "start": started,
+                           "duration": duration, "bytes": size})
+        with self.lock:
+            self.file.write(line + '\n')
+
+    def close(self):
+        """Closes the trace file"""
+        self.file.close()
+
+
+stats = Stats()
+_targets = []
+_originals = []
+_sinks = []
+
+
+def register(owner, name, label=None, size=None):
+    """Adds a function to the ones timed while instrumentation is on
+
+    Args:
+        owner: the class or module holding the function.
+        name: the attribute name of the function in owner.
+        label: the name the calls are recorded under, or a function of
+            the call arguments returning it. Defaults to Owner.name.
+        size: a function of the call arguments and result returning
+            the number of bytes read or written.
+    """
+    if label is None:
+        label = "{}.{}".format(getattr(owner, "__name__", owner), name)
+    target = (owner, name, label, size)
+    _targets.append(target)
+    if _sinks:
+        _wrap(*target)
+
+
+def enable(*sinks):
+    """Starts timing the registered functions
+
+    Args:
+        sinks: objects with a `record(name, started, duration, size)`
+            method that receive every call, besides `stats`.
+    """
+    if not _sinks:
+        _sinks.append(stats)
+        for target in _targets:
+            _wrap(*target)
+    _sinks.extend(sinks)
+
+
+def disable():
+    """Stops timing and puts the original functions back"""
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+    for sink in _sinks:
+        if hasattr(sink, "close"):
+            sink.close()
+    del _sinks[:]
+
+
+def enabled():
+    """Tells if instrumentation is on"""
+    return bool(_sinks)
+
+
+def _wrap(owner, name, label, size):
+    """Replaces a registered function with its timed wrapper"""
+    original = inspect.getattr_static(owner, name)
+    static = isinstance(original, staticmethod)
+    function = original.__func__ if static else original
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        started = time.time()
+        begin = time.perf_counter()
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        finally:
+            duration = time.perf_counter() - begin
+            called = label(args) if callable(label) else label
+            written = size(args, result) if size is not None else 0
+            for sink in _sinks:
+                sink.record(called, started, duration, written)
+
+    setattr(owner, name, staticmethod(timed) if static else timed)
+    _originals.append((owner, name, original))
+
+
+for _name in ("save", "reload", "new", "flush", "compact", "search"):
+    # Whichever engine models.storage is
+    if hasattr(type(models.storage), _name):
+        register(type(models.storage), _name)
+register(FileStorage, "_FileStorage__read", "FileStorage.read")
+register(FileStorage, "_FileStorage__dump", "FileStorage.encode",
+         lambda args, result: len(result or b''))
+register(FileStorage, "_FileStorage__write_atomically", "FileStorage.write",
+         lambda args, result: len(args[1]))
+register(snapshot, "loads", "snapshot.loads",
+         lambda args, result: len(args[0]))
+register(timestamps, "parse", "timestamps.parse")
+for _name in ("__init__", "to_dict", "save"):
+    register(BaseModel, _name)
@@ -5,8 +5,10 @@ It defines one class, `Place(),
 which sub-classes the `BaseModel()` class.`
 """
 from models.base_model import BaseModel
+from models.compact import compact_model
 
 
+@compact_model
 class Place(BaseModel):
     """A place/house in the application.
 
@@ -26,6 +28,11 @@ class Place(BaseModel):
         max_guest
         amenity_ids
     """
+    indexed_attributes = ("city_id", "user_id")
+    spatial_attributes = ("latitude", "longitude")
+    text_attributes = ("name", "description")
+    sorted_attributes = BaseModel.sorted_attributes + (
+        "number_bathrooms", "price_by_night", "number_rooms", "max_guest")
 
     name = ""
     user_id = ""
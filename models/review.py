@@ -5,8 +5,10 @@ It defines one class, `Review(),
 which sub-classes the `BaseModel()` class.`
 """
 from models.base_model import BaseModel
+from models.compact import compact_model
 
 
+@compact_model
 class Review(BaseModel):
     """A review of a place/house.
 
@@ -18,6 +20,9 @@ class Review(BaseModel):
         user_id
         place_id
     """
+    indexed_attributes = ("place_id", "user_id")
+    text_attributes = ("text",)
+
     text = ""
     user_id = ""
     place_id = ""
@@ -5,12 +5,16 @@ It defines one class, `State(),
 which sub-classes the `BaseModel()` class.`
 """
 from models.base_model import BaseModel
+from models.compact import compact_model
 
 
+@compact_model
 class State(BaseModel):
     """A state in the application.
 
     Attributes:
         name
     """
+    text_attributes = ("name",)
+
     name = ""
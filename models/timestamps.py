@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+"""The `timestamps` module
+
+It defines the codec every model uses to turn the `created_at` and
+`updated_at` timestamps into ISO 8601 strings and back:
+
+    2024-06-30T09:39:38.071064  (or 2024-06-30T09:39:38 when the
+                                 microseconds are zero)
+
+Parsing goes through `datetime.fromisoformat()` and both directions are
+cached, since a store holds many identical timestamps. The `Timestamp`
+descriptor lets a model keep the string it was loaded from, checked
+but not converted, until the timestamp is first read, so that
+`to_dict()` on an untouched object does not format it again.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+CACHE_SIZE = 65536
+# What `format()` writes, ASCII digits only. fromisoformat() also reads
+# week dates, offsets and other layouts, which would not be written back
+# the same
+LAYOUT = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d{6})?', re.ASCII)
+
+
+def check(value):
+    """Returns value if it is a datetime or a valid timestamp string
+
+    Strings are parsed, and the cached datetime is there for the first
+    read of the attribute.
+
+    Raises:
+        ValueError: when value is not a real date in the format
+            `format()` writes.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        raise ValueError("invalid timestamp: {!r}".format(value))
+    parse(value)
+    return value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse(value):
+    """Returns the datetime of a timestamp string
+
+    Raises:
+        ValueError: when value is not a real date in the format
+            `format()` writes.
+    """
+    if value.__class__ is str and LAYOUT.fullmatch(value):
+        return datetime.fromisoformat(value)
+    raise ValueError("invalid timestamp: {!r}".format(value))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format(moment):
+    """Returns the timestamp string of a datetime"""
+    return moment.isoformat()
+
+
+def dump(value):
+    """Returns the timestamp string of a datetime or unparsed string"""
+    if isinstance(value, str):
+        return value
+    return format(value)
+
+
+class Timestamp:
+    """A model attribute that may hold its string until it is read
+
+    The value lives in the instance dictionary under the attribute name,
+    either as a datetime or as the string it was loaded from.
+    """
+
+    def __set_name__(self, owner, name):
+        """Records the attribute name"""
+        self.name = name
+
+    def __get__(self, obj, cls=None):
+        """Returns the timestamp, parsing it on first read"""
+        if obj is None:
+            return self
+        try:
+            value = obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError("'{}' object has no attribute '{}'".format(
+                type(obj).__name__, self.name)) from None
+        if isinstance(value, str):
+            value = parse(value)
+            obj.__dict__[self.name] = value
+        return value
+
+    def __set__(self, obj, value):
+        """Stores a datetime or a checked timestamp string"""
+        obj.__dict__[self.name] = value
+
+    def __delete__(self, obj):
+        """Removes the timestamp"""
+        try:
+            del obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
@@ -5,8 +5,10 @@ Module: user.py
 Defines a `User` class that inherits from `BaseModel`.
 """
 from models.base_model import BaseModel
+from models.compact import compact_model
 
 
+@compact_model
 class User(BaseModel):
     """Creates a new User"""
     email = ""
@@ -0,0 +1,148 @@
+"""Module: test_app.py"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from api.v1.app import Cache, Server, main
+from models import storage
+from models.engine.sqlite_storage import SQLiteStorage
+from models.place import Place
+from models.state import State
+
+
+class TestApp(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """Serve a few saved objects from a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        storage.reset(os.path.join(self.tmpdir, "file.json"))
+        self.places = []
+        for name, price in (("Sea view", 80), ("Cabin", 40),
+                            ("Sea loft", 120)):
+            place = Place()
+            place.name = name
+            place.price_by_night = price
+            self.places.append(place)
+        self.state = State()
+        self.state.name = "Texas"
+        storage.save()
+
+        self.server = await asyncio.start_server(
+            Server(Cache()).handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection(
+            "127.0.0.1", port)
+
+    async def asyncTearDown(self):
+        """Stop the server and restore the default storage settings."""
+        self.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+        storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    async def request(self, path, method="GET", **headers):
+        """Sends a request over the connection, returns the status, the
+        headers and the body of the response."""
+        lines = ["{} {} HTTP/1.1".format(method, path), "Host: test"]
+        lines.extend("{}: {}".format(name.replace("_", "-"), value)
+                     for name, value in headers.items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode().split("\r\n")
+        received = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                received[name.lower()] = value.strip()
+        # Answers to HEAD have the length of a body they do not send
+        body = b"" if method == "HEAD" else await self.reader.readexactly(
+            int(received.get("content-length", 0)))
+        return int(lines[0].split(" ")[1]), received, body
+
+    async def get(self, path):
+        """Returns the status and JSON content of a GET request."""
+        status, _, body = await self.request(path)
+        return status, json.loads(body)
+
+    async def test_status_and_stats(self):
+        self.assertEqual(await self.get("/api/v1/status"),
+                         (200, {"status": "OK"}))
+        status, stats = await self.get("/api/v1/stats")
+        self.assertEqual((stats["Place"], stats["State"], stats["User"]),
+                         (3, 1, 0))
+
+    async def test_show(self):
+        path = "/api/v1/State/" + self.state.id
+        status, headers, body = await self.request(path)
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), self.state.to_dict())
+        self.assertEqual(headers["connection"], "keep-alive")
+        status, _, body = await self.request(
+            path, If_None_Match=headers["etag"])
+        self.assertEqual((status, body), (304, b""))
+        status, _, body = await self.request(path, "HEAD")
+        self.assertEqual((status, body), (200, b""))
+
+    async def test_errors(self):
+        self.assertEqual((await self.get("/api/v1/State/nope"))[0], 404)
+        self.assertEqual((await self.get("/api/v1/Nope"))[0], 404)
+        self.assertEqual((await self.get("/nope"))[0], 404)
+        self.assertEqual((await self.request("/api/v1/State",
+                                             "POST"))[0], 405)
+        status, content = await self.get("/api/v1/Place?order_by=name")
+        self.assertEqual(status, 400)
+        self.assertIn("error", content)
+        # The connection is still usable after errors
+        self.assertEqual((await self.get("/api/v1/status"))[0], 200)
+
+    async def test_internal_error(self):
+        with patch.object(storage, "refresh", side_effect=RuntimeError), \
+                patch("sys.stderr", new_callable=StringIO) as errors:
+            status, headers, body = await self.request("/api/v1/status")
+        self.assertEqual(status, 500)
+        self.assertEqual(headers["connection"], "close")
+        self.assertIn("error", json.loads(body))
+        self.assertIn("RuntimeError", errors.getvalue())
+        self.assertEqual(await self.reader.read(), b"")
+
+    async def test_list(self):
+        status, places = await self.get(
+            "/api/v1/Place?order_by=-price_by_night&limit=2")
+        self.assertEqual([place["name"] for place in places],
+                         ["Sea loft", "Sea view"])
+        status, places = await self.get(
+            "/api/v1/Place?price_by_night=50..&offset=1")
+        self.assertEqual(len(places), 1)
+        status, places = await self.get("/api/v1/Place?price_by_night=40")
+        self.assertEqual([place["name"] for place in places], ["Cabin"])
+        status, places = await self.get("/api/v1/Place?q=sea&limit=5")
+        self.assertEqual(sorted(place["name"] for place in places),
+                         ["Sea loft", "Sea view"])
+        self.assertEqual(await self.get("/api/v1/Place/count?q=cabin"),
+                         (200, {"count": 1}))
+
+    async def test_changes_invalidate(self):
+        path = "/api/v1/Place?order_by=price_by_night"
+        status, headers, _ = await self.request(path)
+        self.places[1].price_by_night = 200
+        status, changed, body = await self.request(
+            path, If_None_Match=headers["etag"])
+        self.assertEqual(status, 200)
+        self.assertNotEqual(changed["etag"], headers["etag"])
+        self.assertEqual(json.loads(body)[-1]["name"], "Cabin")
+
+
+class TestMain(unittest.TestCase):
+    def test_storage_without_refresh(self):
+        with patch("api.v1.app.storage", SQLiteStorage()), \
+                patch("sys.stderr", new_callable=StringIO) as errors:
+            self.assertEqual(main([]), 1)
+        self.assertIn("FileStorage", errors.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
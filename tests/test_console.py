@@ -0,0 +1,288 @@
+"""Module: test_console.py"""
+import ast
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from console import HBNBCommand, main, parse_arguments
+from models import storage
+from models.engine.sqlite_storage import SQLiteStorage
+from models.place import Place
+from models.user import User
+
+
+class TestParseArguments(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(parse_arguments(""), [])
+        self.assertEqual(parse_arguments("a,"), ["a"])
+        self.assertEqual(parse_arguments(' "a b", c d ,3'),
+                         ["a b", "c d", "3"])
+        self.assertEqual(parse_arguments("""'it\\'s', "say \\"hi\\"" """),
+                         ["it's", 'say "hi"'])
+        self.assertEqual(parse_arguments('"1", {"a": [1, 2], "b": "x, y"}'),
+                         ["1", {"a": [1, 2], "b": "x, y"}])
+
+    def test_malformed(self):
+        for text in ('"open', "a,,b", "{'a': }", '"a" "b"',
+                     "{1: __import__('os')}"):
+            self.assertIsNone(parse_arguments(text), text)
+
+
+class TestConsoleDotCommands(unittest.TestCase):
+    def setUp(self):
+        """Create a user in a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        storage.reset(os.path.join(self.tmpdir, "file.json"))
+        self.user = User()
+        self.user.age = 20
+        storage.save()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def run_command(self, line):
+        """Returns what the console prints for one command line."""
+        with patch("sys.stdout", new_callable=StringIO) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue()
+
+    def test_show_and_count(self):
+        self.assertEqual(self.run_command(
+            'User.show("{}")'.format(self.user.id)), str(self.user) + "\n")
+        self.assertEqual(self.run_command("User.count()"), "1\n")
+
+    def test_update(self):
+        self.run_command('User.update("{}", "first_name", "Betty Sue")'
+                         .format(self.user.id))
+        self.assertEqual(self.user.first_name, "Betty Sue")
+        self.run_command('User.update("{}", {{"age": "89", "x": [1]}})'
+                         .format(self.user.id))
+        self.assertEqual((self.user.age, self.user.x), (89, [1]))
+
+    def test_update_invalid(self):
+        line = 'User.update("{}", {})'
+        self.assertEqual(
+            self.run_command(line.format(self.user.id, '{"age": "old"}')),
+            "** value type mismatch **\n")
+        self.assertEqual(
+            self.run_command(line.format(self.user.id, "{1: 2}")),
+            "** invalid attribute name 1 **\n")
+        self.assertEqual(
+            self.run_command(line.format(
+                self.user.id, '{"first_name": "B", "__class__": "Place"}')),
+            "** invalid attribute name __class__ **\n")
+        self.assertEqual(
+            self.run_command(line.format(self.user.id, '{"id": "1"}')),
+            "** can't update id **\n")
+        self.assertEqual(
+            self.run_command("update User {} _row 0".format(self.user.id)),
+            "** invalid attribute name _row **\n")
+        self.assertEqual(
+            self.run_command(line.format(self.user.id, '{"to_dict": 1}')),
+            "** invalid attribute name to_dict **\n")
+        self.assertEqual(
+            self.run_command("update User {} save x".format(self.user.id)),
+            "** invalid attribute name save **\n")
+        self.assertEqual(self.user.age, 20)
+        self.assertEqual(self.user.first_name, "")
+        self.assertIs(self.user.__class__, User)
+
+    def test_invalid_syntax(self):
+        self.assertEqual(self.run_command("Nope.all()"),
+                         "** class doesn't exist **\n")
+        for line in ("User.nope()", "User.show(", 'User.show("1" "2")',
+                     "User.update({'a': })"):
+            self.assertEqual(self.run_command(line),
+                             "*** Unknown syntax: {}\n".format(line))
+
+
+class TestConsoleAll(unittest.TestCase):
+    def setUp(self):
+        """Create a few users in a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        storage.reset(os.path.join(self.tmpdir, "file.json"))
+        self.users = [User() for _ in range(5)]
+        storage.save()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def run_command(self, line):
+        """Returns what the console prints for one command line."""
+        with patch("sys.stdout", new_callable=StringIO) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue()
+
+    def test_same_as_printing_a_list(self):
+        expected = [str(user) for user in self.users]
+        self.assertEqual(self.run_command("all User"),
+                         str(expected) + "\n")
+        self.assertEqual(self.run_command("User.all()"),
+                         str(expected) + "\n")
+        self.assertEqual(self.run_command("all"), str(expected) + "\n")
+
+    def test_offset_and_limit(self):
+        shown = ast.literal_eval(self.run_command("all User offset=1 limit=2"))
+        self.assertEqual(shown, [str(user) for user in self.users[1:3]])
+        self.assertEqual(self.run_command("all User offset=9"), "[]\n")
+        self.assertEqual(self.run_command("all User limit=0"), "[]\n")
+
+    def test_jsonl(self):
+        lines = self.run_command("all User limit=2 jsonl").splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [user.to_dict() for user in self.users[:2]])
+        self.assertEqual(self.run_command("all jsonl limit=0"), "")
+
+    def test_invalid_options(self):
+        self.assertEqual(self.run_command("all User limit=-1"),
+                         "** invalid option limit=-1 **\n")
+        self.assertEqual(self.run_command("all User lines"),
+                         "** invalid option lines **\n")
+        self.assertEqual(self.run_command("all Nope"),
+                         "** class doesn't exist **\n")
+
+
+class TestConsoleBatch(unittest.TestCase):
+    def setUp(self):
+        """Save a few users and write a script using them."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        storage.reset(self.path)
+        first, second = User(), User()
+        storage.save()
+        with open(self.path) as file:
+            self.saved = file.read()
+        self.script = os.path.join(self.tmpdir, "script.txt")
+        with open(self.script, "w") as file:
+            file.write("\n".join([
+                "count User",
+                "all User",
+                "show User " + first.id,
+                "update User {} first_name Betty".format(first.id),
+                'User.update("{}", {{"age": 89}})'.format(second.id),
+                "User.count()",
+                "",
+                "destroy User " + second.id,
+                "show User " + second.id,
+                "show Nope",
+                "nope",
+                "help quit",
+            ]) + "\n")
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def restart(self):
+        """Reads the saved users again, as a new process would."""
+        with open(self.path, "w") as file:
+            file.write(self.saved)
+        storage.reset(self.path)
+        storage.reload()
+
+    def interactive(self):
+        """Returns what cmdloop() writes for the script."""
+        self.restart()
+        with open(self.script) as script, \
+                patch("sys.stdout", new_callable=StringIO) as output:
+            console = HBNBCommand(stdin=script)
+            console.use_rawinput = False
+            console.cmdloop()
+        return output.getvalue()
+
+    def batch(self, *options):
+        """Returns what batch mode writes for the script."""
+        self.restart()
+        with patch("sys.stdout", new_callable=StringIO) as output:
+            main(["--batch", self.script] + list(options))
+        return output.getvalue()
+
+    def test_same_output_as_cmdloop(self):
+        expected = self.interactive()
+        self.assertIn("(hbnb) ** no instance found **", expected)
+        self.assertEqual(self.batch(), expected)
+        self.assertEqual(self.batch("--checkpoint", "3"), expected)
+
+    def test_changes_are_saved(self):
+        self.batch("--checkpoint", "2")
+        with open(self.path) as file:
+            records = json.load(file)
+        self.assertEqual(len(records), 1)
+        record, = records.values()
+        self.assertEqual(record["first_name"], "Betty")
+
+    def test_stats(self):
+        with patch("sys.stderr", new_callable=StringIO) as errors:
+            self.batch("--stats")
+        self.assertIn("13 commands in", errors.getvalue())
+
+    def test_invalid_checkpoint(self):
+        for value in ("-1", "two"):
+            with patch("sys.stderr", new_callable=StringIO), \
+                    self.assertRaises(SystemExit):
+                main(["--batch", self.script, "--checkpoint", value])
+
+
+class TestConsoleQueries(unittest.TestCase):
+    def setUp(self):
+        """Create a place in a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        storage.reset(os.path.join(self.tmpdir, "file.json"))
+        self.place = Place()
+        self.place.name = "Sea view"
+        self.place.latitude, self.place.longitude = 48.85, 2.35
+        self.place.price_by_night = 80
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def run_command(self, line):
+        """Returns what the console prints for one command line."""
+        with patch("sys.stdout", new_callable=StringIO) as output:
+            HBNBCommand().onecmd(line)
+        return output.getvalue()
+
+    def test_queries(self):
+        expected = str([str(self.place)]) + "\n"
+        self.assertEqual(self.run_command("near Place 48.8 2.3 10"),
+                         expected)
+        self.assertEqual(self.run_command("within Place 48 2 49 3"),
+                         expected)
+        self.assertEqual(self.run_command("search Place sea"), expected)
+        self.assertEqual(self.run_command("all Place price_by_night=50.."),
+                         expected)
+
+    def test_invalid_range(self):
+        for line in ("all Place created_at=2020-01-01T00:00:00+00:00..",
+                     "all Place price_by_night=a..b",
+                     "all Place price_by_night=2020-01-01.."):
+            self.assertEqual(self.run_command(line),
+                             "** value type mismatch **\n")
+
+    def test_numbers_must_be_finite(self):
+        for line in ("near Place 0 0 nan", "near Place 0 inf 10",
+                     "within Place nan 0 10 10", "within Place 0 0 -inf 1"):
+            self.assertEqual(self.run_command(line),
+                             "** value type mismatch **\n")
+
+    def test_not_supported(self):
+        with patch("console.storage", SQLiteStorage()):
+            for line in ("near Place 0 0 10", "within Place 0 0 10 10",
+                         "search Place sea", "all Place price_by_night=1..",
+                         "all Place order_by=price_by_night"):
+                self.assertEqual(self.run_command(line),
+                                 "** not supported by this storage **\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@ import unittest
 from datetime import datetime
 import models
 import uuid
-from models.base_model import BaseModel
+from models.base_model import BaseModel, classes
+from models.user import User
 from unittest.mock import patch, MagicMock
 
 
@@ -65,6 +66,12 @@ class TestBaseModel(unittest.TestCase):
         self.assertNotEqual(self.model.updated_at, original_updated_at)
         self.assertTrue(mock_storage.save.called)
 
+    def test_save_after_delete(self):
+        models.storage.delete(self.model)
+        with patch.object(models.storage, "save"):
+            self.model.save()
+        self.assertIsNone(models.storage.get(BaseModel, self.model.id))
+
     def test_to_dict(self):
         dict = self.model.to_dict()
         self.assertEqual(dict["__class__"], "BaseModel")
@@ -72,5 +79,14 @@ class TestBaseModel(unittest.TestCase):
         self.assertEqual(dict["created_at"], self.model.created_at.isoformat())
         self.assertEqual(dict["updated_at"], self.model.updated_at.isoformat())
 
+    def test_registry(self):
+        self.assertIs(classes["BaseModel"], BaseModel)
+        self.assertIs(classes["User"], User)
+
+        class Pet(BaseModel):
+            """A model defined after the others."""
+        self.assertIs(classes["Pet"], Pet)
+        del classes["Pet"]
+
     if __name__ == '__main__':
         unittest.main()
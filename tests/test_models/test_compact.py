@@ -0,0 +1,78 @@
+"""Module: test_compact.py"""
+import unittest
+from unittest.mock import patch
+import models
+from models import compact
+from models.base_model import BaseModel, classes
+
+
+class TestCompactModel(unittest.TestCase):
+    def setUp(self):
+        """Build the plain and compact variants of a model."""
+        class Listing(BaseModel):
+            """A model with declared attributes."""
+            name = ""
+            rooms = 0
+
+        self.Listing = Listing
+        with patch.object(compact, "COMPACT", True):
+            self.Compact = compact.compact_model(Listing)
+        self.plain = Listing()
+        self.compact = self.Compact()
+        for obj in (self.plain, self.compact):
+            obj.rooms = 3
+            obj.extra = {"a": 1}
+            obj.name = "home"
+
+    def tearDown(self):
+        """Drop the test objects and classes."""
+        models.storage.delete(self.plain)
+        models.storage.delete(self.compact)
+        del classes["Listing"]
+
+    def test_disabled_returns_class(self):
+        with patch.object(compact, "COMPACT", False):
+            self.assertIs(compact.compact_model(self.Listing), self.Listing)
+
+    def test_same_name_and_type(self):
+        self.assertEqual(self.Compact.__name__, "Listing")
+        self.assertIsInstance(self.compact, self.Listing)
+        self.assertNotIn("rooms", self.compact.__dict__)
+
+    def test_same_output(self):
+        self.compact.id = self.plain.id
+        self.compact.created_at = self.plain.created_at
+        self.compact.updated_at = self.plain.updated_at
+        self.assertEqual(str(self.compact), str(self.plain))
+        self.assertEqual(self.compact.to_dict(), self.plain.to_dict())
+
+    def test_defaults_and_delete(self):
+        obj = self.Compact(id="not-a-uuid",
+                           created_at="2024-01-01T00:00:00.000000",
+                           updated_at="2024-01-01T00:00:00.000000")
+        self.assertEqual(obj.id, "not-a-uuid")
+        self.assertEqual(obj.rooms, 0)
+        obj.rooms = 2
+        del obj.rooms
+        self.assertEqual(obj.rooms, 0)
+        self.assertNotIn("rooms", obj.to_dict())
+
+    def test_slots_are_read_only(self):
+        other = self.Compact()
+        for name in ("_row", "_layout"):
+            with self.assertRaises(AttributeError):
+                setattr(self.compact, name, getattr(other, name))
+            with self.assertRaises(AttributeError):
+                delattr(self.compact, name)
+        with self.assertRaises(AttributeError):
+            self.Compact(_row=other._row)
+        self.assertEqual(self.compact.name, "home")
+        models.storage.delete(other)
+
+    def test_rows_are_reused(self):
+        table = self.Compact._table
+        size = len(table.flags)
+        for _ in range(10):
+            self.Compact(id="x", created_at="2024-01-01T00:00:00.000001",
+                         updated_at="2024-01-01T00:00:00.000001")
+        self.assertLessEqual(len(table.flags), size + 1)
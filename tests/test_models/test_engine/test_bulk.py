@@ -0,0 +1,115 @@
+"""Module: test_bulk.py"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from models.engine import bulk
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.user import User
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self):
+        """Start from an empty storage in a scratch directory."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage = FileStorage()
+        self.storage.reset(self.path("file.json"))
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        """Returns the path of a scratch file."""
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name, lines):
+        """Writes lines to a scratch file and returns its path."""
+        with open(self.path(name), "w") as file:
+            file.write("\n".join(lines) + "\n")
+        return self.path(name)
+
+    def test_import_jsonl(self):
+        path = self.write("objects.jsonl", [
+            json.dumps({"__class__": "User", "id": "1",
+                        "created_at": "2024-06-30T09:39:38.071064",
+                        "updated_at": "2024-06-30T09:39:38",
+                        "email": "a@b.c"}),
+            "",
+            json.dumps({"__class__": "Place", "number_rooms": 3,
+                        "latitude": 2}),
+        ])
+        with patch.object(FileStorage, "save") as save:
+            report = bulk.import_file(path, workers=1, storage=self.storage)
+        save.assert_called_once_with()
+        self.assertEqual((report.records, report.skipped), (2, 0))
+        user = self.storage.get(User, "1")
+        self.assertEqual(user.email, "a@b.c")
+        self.assertEqual(user.updated_at.isoformat(), "2024-06-30T09:39:38")
+        place = next(iter(self.storage.all(Place).values()))
+        self.assertEqual(place.number_rooms, 3)
+        self.assertIsInstance(place.latitude, float)
+
+    def test_import_invalid(self):
+        path = self.write("users.jsonl", [
+            '{"email": "a@b.c"}',
+            'not json',
+            '{"created_at": "yesterday"}',
+            '{"created_at": "2024-02-31T10:00:00"}',
+            '{"updated_at": ["2024-06-30T09:39:38"]}',
+            '{"__class__": "Place"}',
+            '{"__class__": "Nope"}',
+            '{"first_name": 5, "last_name": null}',
+        ])
+        report = bulk.import_file(path, User, workers=1,
+                                  storage=self.storage)
+        self.assertEqual((report.records, report.skipped), (1, 7))
+        self.assertTrue(report.errors[0].startswith("line 2: "))
+        self.assertEqual(len(report.errors), 7)
+        self.assertEqual(self.storage.count(User), 1)
+
+    def test_csv_round_trip(self):
+        places = []
+        for number in range(5):
+            place = Place()
+            place.name = "Place, {}".format(number)
+            place.price_by_night = number * 10
+            place.amenity_ids = ["a", str(number)]
+            places.append(place.to_dict())
+        places[0]["description"] = "Only\none"
+        self.storage.get(Place, places[0]["id"]).description = "Only\none"
+
+        path = self.path("places.csv")
+        report = bulk.export_file(path, Place, workers=1,
+                                  storage=self.storage)
+        self.assertEqual(report.records, 5)
+        self.storage.reset(self.path("file.json"))
+        report = bulk.import_file(path, "Place", workers=2, chunk_size=2,
+                                  storage=self.storage)
+        self.assertEqual((report.records, report.skipped), (5, 0))
+        self.assertEqual(
+            sorted(obj.to_dict()["id"] for obj in
+                   self.storage.all(Place).values()),
+            sorted(place["id"] for place in places))
+        for place in places:
+            self.assertEqual(
+                self.storage.get(Place, place["id"]).to_dict(), place)
+
+    def test_export_jsonl(self):
+        users = [User() for _ in range(3)]
+        path = self.path("users.jsonl")
+        bulk.export_file(path, workers=2, chunk_size=2,
+                         storage=self.storage)
+        with open(path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records, [user.to_dict() for user in users])
+        with self.assertRaises(ValueError):
+            bulk.export_file(self.path("all.csv"), storage=self.storage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,39 @@
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 from models.base_model import BaseModel
+from models.user import User
+from models.city import City
+from models.place import Place
+from models.review import Review
 from models.engine.file_storage import FileStorage
 import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 
 
 class TestFileStorage(unittest.TestCase):
     def setUp(self):
         """Set up test methods."""
+        # The default file.json, in a scratch working directory
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
         self.storage = FileStorage()
+        self.storage.reset()
         self.model = BaseModel()
         self.model.id = "123456"
         self.model_dict = self.model.to_dict()
 
     def tearDown(self):
         """Clean up after tests."""
-        FileStorage._FileStorage__objects = {}
+        self.storage.reset()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
 
     def test_all(self):
         self.storage.new(self.model)
@@ -60,3 +77,729 @@ class TestFileStorage(unittest.TestCase):
 
     if __name__ == '__main__':
         unittest.main()
+
+
+class TestFileStorageJournal(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file in journal mode."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+        self.storage.enable_journal()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_appends_to_journal(self):
+        model = BaseModel()
+        self.storage.new(model)
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        with open(self.storage.journal_path()) as file:
+            lines = file.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])[:2],
+                         ["set", "BaseModel." + model.id])
+
+    def test_reload_replays_journal(self):
+        kept = BaseModel()
+        gone = BaseModel()
+        self.storage.save()
+        self.storage.delete(gone)
+        kept.name = "kept"
+        kept.save()
+        self.storage.reset(self.path)
+        self.storage.reload()
+        objects = self.storage.all()
+        self.assertIn("BaseModel." + kept.id, objects)
+        self.assertNotIn("BaseModel." + gone.id, objects)
+        self.assertEqual(objects["BaseModel." + kept.id].name, "kept")
+
+    def test_torn_line(self):
+        first = BaseModel()
+        self.storage.save()
+        with open(self.storage.journal_path(), "a") as file:
+            # An append cut off by a crash
+            file.write('["set","BaseModel.torn",{"id":')
+        second = BaseModel()
+        self.storage.save()
+        self.storage.reset(self.path)
+        self.storage.enable_journal()
+        self.storage.reload()
+        self.assertEqual(sorted(self.storage.all()),
+                         sorted(["BaseModel." + first.id,
+                                 "BaseModel." + second.id]))
+
+    def test_compaction(self):
+        self.storage.enable_journal(limit=0)
+        model = BaseModel()
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.storage.journal_path()))
+        with open(self.path) as file:
+            self.assertIn("BaseModel." + model.id, json.load(file))
+
+
+class TestFileStorageDirtyTracking(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_output_matches_json_dump(self):
+        first = BaseModel()
+        first.text = "multi\nline \"quoted\""
+        first.numbers = [1, 2, {"nested": True}]
+        BaseModel()
+        self.storage.save()
+        expected = {key: obj.to_dict()
+                    for key, obj in self.storage.all().items()}
+        with open(self.path) as file:
+            self.assertEqual(file.read(), json.dumps(expected, indent=4))
+
+    def test_save_only_serializes_changed_objects(self):
+        objs = [BaseModel() for _ in range(3)]
+        self.storage.save()
+        # A process that saves once keeps nothing
+        self.assertEqual(FileStorage._FileStorage__cache, {})
+        self.storage.save()
+        objs[1].name = "changed"
+        with patch.object(BaseModel, "to_dict",
+                          autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            self.storage.save()
+        self.assertEqual(to_dict.call_count, 1)
+        with open(self.path) as file:
+            saved = json.load(file)
+        self.assertEqual(saved["BaseModel." + objs[1].id]["name"],
+                         "changed")
+
+    def test_cached_output_matches_json_dump(self):
+        first = BaseModel()
+        self.storage.save()
+        first.text = "multi\nline \"quoted\""
+        BaseModel()
+        self.storage.save()
+        self.storage.save()
+        expected = {key: obj.to_dict()
+                    for key, obj in self.storage.all().items()}
+        with open(self.path) as file:
+            self.assertEqual(file.read(), json.dumps(expected, indent=4))
+
+    def test_reset_forgets_pending_changes(self):
+        BaseModel().name = "changed"
+        self.storage.delete(BaseModel())
+        self.storage.reset(self.path)
+        self.storage.save()
+        with open(self.path) as file:
+            self.assertEqual(json.load(file), {})
+
+
+class TestFileStorageClassIndex(unittest.TestCase):
+    def setUp(self):
+        """Start every test from an empty store."""
+        self.storage = FileStorage()
+        self.storage.reset()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.storage.reset()
+
+    def test_all_and_count_by_class(self):
+        users = [User() for _ in range(3)]
+        BaseModel()
+        self.assertEqual(self.storage.count(), 4)
+        self.assertEqual(self.storage.count(User), 3)
+        self.assertEqual(self.storage.count("User"), 3)
+        self.assertEqual(self.storage.count("State"), 0)
+        self.assertEqual(
+            self.storage.all(User),
+            {"User." + user.id: user for user in users})
+
+    def test_delete_updates_index(self):
+        user = User()
+        self.storage.delete(user)
+        self.assertEqual(self.storage.all("User"), {})
+        self.assertEqual(self.storage.count(), 0)
+
+
+class TestFileStorageFilter(unittest.TestCase):
+    def setUp(self):
+        """Start every test from an empty store."""
+        self.storage = FileStorage()
+        self.storage.reset()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.storage.reset()
+
+    def test_filter_uses_index(self):
+        place = Place()
+        other = Place()
+        reviews = [Review() for _ in range(3)]
+        for review in reviews[:2]:
+            review.place_id = place.id
+        reviews[2].place_id = other.id
+        found = self.storage.filter(Review, place_id=place.id)
+        self.assertEqual(set(found.values()), set(reviews[:2]))
+        index = FileStorage._FileStorage__attributes[("Review", "place_id")]
+        self.assertEqual(len(index[place.id]), 2)
+
+    def test_filter_follows_updates_and_deletes(self):
+        city = City()
+        city.state_id = "a"
+        city.state_id = "b"
+        self.assertEqual(self.storage.filter(City, state_id="a"), {})
+        self.assertEqual(list(self.storage.filter(City, state_id="b")
+                              .values()), [city])
+        self.storage.delete(city)
+        self.assertEqual(self.storage.filter(City, state_id="b"), {})
+
+    def test_filter_on_unindexed_attribute(self):
+        city = City()
+        city.name = "Lagos"
+        City().name = "Abuja"
+        self.assertEqual(list(self.storage.filter("City", name="Lagos")
+                              .values()), [city])
+
+
+class TestFileStorageLazy(unittest.TestCase):
+    def setUp(self):
+        """Save a few objects, then lazily reload them."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+        self.users = [User() for _ in range(2)]
+        self.city = City()
+        self.storage.save()
+        self.restart()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def restart(self):
+        """Forget the objects in memory and reload lazily, as a new
+        process would."""
+        self.storage.reset(self.path)
+        self.storage.enable_lazy()
+        self.storage.reload()
+
+    def loaded(self):
+        """Returns the objects built so far."""
+        return FileStorage._FileStorage__objects
+
+    def test_reload_builds_nothing(self):
+        self.assertEqual(self.loaded(), {})
+
+    def test_get_builds_one_object(self):
+        user = self.storage.get(User, self.users[0].id)
+        self.assertEqual(user.to_dict(), self.users[0].to_dict())
+        self.assertEqual(list(self.loaded()), ["User." + user.id])
+        self.assertIsNone(self.storage.get("User", "missing"))
+
+    def test_class_scoped_access(self):
+        self.assertEqual(self.storage.count(User), 2)
+        self.assertNotIn("City." + self.city.id, self.loaded())
+        self.assertEqual(len(self.storage.all()), 3)
+
+    def test_deleted_objects_stay_deleted(self):
+        user = self.storage.get(User, self.users[0].id)
+        self.storage.delete(user)
+        self.assertEqual(self.storage.count(), 2)
+        self.assertIsNone(self.storage.get(User, user.id))
+
+    def test_get_sees_journal(self):
+        self.storage.enable_journal()
+        user = self.storage.get(User, self.users[1].id)
+        user.first_name = "Betty"
+        user.save()
+        self.restart()
+        self.assertEqual(
+            self.storage.get(User, user.id).first_name, "Betty")
+
+    def test_get_from_indexed_snapshot(self):
+        self.storage.set_format("indexed")
+        self.storage.save()
+        self.restart()
+        user = self.storage.get(User, self.users[0].id)
+        self.assertEqual(user.to_dict(), self.users[0].to_dict())
+        self.assertEqual(list(self.loaded()), ["User." + user.id])
+        self.assertIsNone(self.storage.get(User, "missing"))
+
+
+class TestFileStorageBatch(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def saved(self):
+        """Returns the records in the scratch file."""
+        with open(self.path) as file:
+            return json.load(file)
+
+    def test_batch_defers_saves(self):
+        with patch.object(FileStorage, "compact",
+                          autospec=True) as compact:
+            with self.storage.batch():
+                with self.storage.batch():
+                    for _ in range(5):
+                        User().save()
+                self.assertEqual(compact.call_count, 0)
+            self.assertEqual(compact.call_count, 1)
+
+    def test_bulk_methods(self):
+        users = self.storage.create_many(
+            User, [{"first_name": "Betty"}, {"first_name": "Bob"}])
+        self.assertEqual(len(self.saved()), 2)
+        self.assertEqual(self.storage.update_many(
+            "User", {users[0].id: {"last_name": "Holberton"},
+                     "missing": {"last_name": "Nobody"}}), 1)
+        self.assertEqual(
+            self.saved()["User." + users[0].id]["last_name"], "Holberton")
+        self.assertEqual(self.storage.destroy_many(
+            User, [user.id for user in users]), 2)
+        self.assertEqual(self.saved(), {})
+
+
+class TestFileStorageWriteBehind(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.close()
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_saves_are_left_to_the_writer(self):
+        self.storage.start_writer(interval=60, threshold=1000)
+        user = User()
+        user.save()
+        self.assertFalse(os.path.exists(self.path))
+        self.storage.close()
+        with open(self.path) as file:
+            self.assertIn("User." + user.id, json.load(file))
+
+    def test_threshold_wakes_the_writer(self):
+        self.storage.start_writer(interval=60, threshold=2)
+        User().save()
+        User().save()
+        for _ in range(100):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.01)
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_failed_write_keeps_old_file(self):
+        User().save()
+        with open(self.path) as file:
+            before = file.read()
+        User()
+        with patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        with open(self.path) as file:
+            self.assertEqual(file.read(), before)
+        self.assertEqual(os.listdir(self.tmpdir), ["file.json"])
+
+    def test_failed_write_of_the_writer(self):
+        self.storage.start_writer(interval=60, threshold=1)
+        user = User()
+        with patch("os.replace", side_effect=OSError("disk full")):
+            user.save()
+            for _ in range(100):
+                try:
+                    self.storage.save()
+                except OSError:
+                    break
+                time.sleep(0.01)
+            else:
+                self.fail("the error of the writer was not raised")
+        self.storage.close()
+        with open(self.path) as file:
+            self.assertIn("User." + user.id, json.load(file))
+
+
+class TestFileStorageShared(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file in shared mode."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+        self.storage.enable_shared()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def saved(self):
+        """Returns the records in the scratch file."""
+        with open(self.path) as file:
+            return json.load(file)
+
+    def test_all_returns_a_copy(self):
+        user = User()
+        objects = self.storage.all()
+        User()
+        self.assertEqual(list(objects), ["User." + user.id])
+
+    def test_save_merges_other_processes(self):
+        user = User()
+        user.save()
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONPATH=root, HBNB_STORAGE_SHARED="1")
+        subprocess.run(
+            [sys.executable, "-c",
+             "from models.user import User; User().save()"],
+            cwd=self.tmpdir, env=env, check=True)
+        other = User()
+        other.save()
+        self.assertEqual(len(self.saved()), 3)
+        self.assertEqual(self.storage.count(User), 3)
+
+    def test_save_keeps_deletions_of_other_processes(self):
+        first, second = User(), User()
+        first.save()
+        records = self.saved()
+        del records["User." + second.id]
+        with open(self.path, "w") as file:
+            json.dump(records, file)
+        first.first_name = "Betty"
+        first.save()
+        self.assertEqual(list(self.saved()), ["User." + first.id])
+        self.assertIsNone(self.storage.get(User, second.id))
+
+    def test_concurrent_threads(self):
+        def work():
+            for _ in range(25):
+                User().save()
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.saved()), 100)
+
+
+class TestFileStorageSharded(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch directory in sharded mode."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.restart()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def restart(self):
+        """Forget the objects in memory, as a new process would."""
+        self.storage.reset(self.path)
+        self.storage.enable_sharding()
+        self.storage.reload()
+
+    def test_one_file_per_class(self):
+        user, place = User(), Place()
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        with open(self.storage.shard_path(User)) as file:
+            self.assertEqual(list(json.load(file)), ["User." + user.id])
+        with open(self.storage.shard_path("Place")) as file:
+            self.assertEqual(list(json.load(file)), ["Place." + place.id])
+
+    def test_only_changed_classes_are_written(self):
+        user, place = User(), Place()
+        self.storage.save()
+        self.restart()
+        os.remove(self.storage.shard_path(Place))
+        user = self.storage.get(User, user.id)
+        user.first_name = "Betty"
+        user.save()
+        self.assertFalse(os.path.exists(self.storage.shard_path(Place)))
+
+    def test_classes_are_loaded_on_demand(self):
+        user, place = User(), Place()
+        self.storage.save()
+        self.restart()
+        self.assertIsNotNone(self.storage.get(User, user.id))
+        self.assertEqual(self.storage.count(User), 1)
+        self.assertNotIn("Place." + place.id,
+                         FileStorage._FileStorage__objects)
+        self.assertEqual(len(self.storage.all()), 2)
+
+    def test_deletion(self):
+        user = User()
+        User().save()
+        self.restart()
+        self.storage.delete(self.storage.get(User, user.id))
+        self.storage.save()
+        self.restart()
+        self.assertEqual(self.storage.count(User), 1)
+
+
+class TestFileStorageSpatial(unittest.TestCase):
+    def setUp(self):
+        """Start from an empty storage."""
+        self.storage = FileStorage()
+        self.storage.reset()
+        self.paris = self.place(48.8566, 2.3522)
+        self.versailles = self.place(48.8049, 2.1204)
+        self.london = self.place(51.5072, -0.1276)
+        self.fiji = self.place(-16.5, 179.9)
+
+    def tearDown(self):
+        """Drop the objects of the test."""
+        self.storage.reset()
+
+    def place(self, latitude, longitude):
+        """Returns a new place at the given coordinates."""
+        place = Place()
+        place.latitude = latitude
+        place.longitude = longitude
+        return place
+
+    def keys(self, *places):
+        """Returns the storage keys of places."""
+        return ["Place." + place.id for place in places]
+
+    def test_near(self):
+        self.assertEqual(list(self.storage.near(Place, 48.85, 2.35, 5)),
+                         self.keys(self.paris))
+        self.assertEqual(list(self.storage.near("Place", 48.80, 2.12, 30)),
+                         self.keys(self.versailles, self.paris))
+        self.assertEqual(self.storage.near(User, 48.85, 2.35, 5), {})
+
+    def test_without_coordinates(self):
+        nowhere = Place()
+        half = Place()
+        half.latitude = 0.0
+        origin = self.place(0.0, 0.0)
+        self.assertEqual(list(self.storage.near(Place, 0, 0, 5)),
+                         self.keys(origin))
+        self.assertEqual(len(self.storage.within(Place, -90, -180, 90,
+                                                 180)), 5)
+        self.assertEqual(nowhere.latitude, 0.0)
+
+    def test_within(self):
+        self.assertEqual(
+            sorted(self.storage.within(Place, 48, 2, 49, 3)),
+            sorted(self.keys(self.paris, self.versailles)))
+        # West greater than east crosses the antimeridian
+        self.assertEqual(list(self.storage.within(Place, -20, 179, -10,
+                                                  -179)),
+                         self.keys(self.fiji))
+        self.assertEqual(len(self.storage.within(Place, -90, -180, 90,
+                                                 180)), 4)
+
+    def test_index_follows_changes(self):
+        self.london.latitude = 48.86
+        self.london.longitude = 2.34
+        self.assertIn("Place." + self.london.id,
+                      self.storage.near(Place, 48.85, 2.35, 5))
+        self.storage.delete(self.paris)
+        self.assertNotIn("Place." + self.paris.id,
+                         self.storage.near(Place, 48.85, 2.35, 5))
+
+
+class TestFileStorageSearch(unittest.TestCase):
+    def setUp(self):
+        """Save a few places and reviews."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+        self.pool = self.place("Pool house", "A pool, and a pool bar")
+        self.flat = self.place("Flat", "Small flat with a pool and wifi")
+        self.cabin = self.place("Cabin", "Wood cabin near the beach")
+        self.review = Review()
+        self.review.text = "Loved the pool"
+        self.storage.save()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def place(self, name, description):
+        """Returns a new place."""
+        place = Place()
+        place.name = name
+        place.description = description
+        return place
+
+    def keys(self, *objects):
+        """Returns the storage keys of objects."""
+        return ["{}.{}".format(type(obj).__name__, obj.id)
+                for obj in objects]
+
+    def test_and_or(self):
+        self.assertEqual(list(self.storage.search(Place, "pool WiFi")),
+                         self.keys(self.flat))
+        self.assertEqual(sorted(self.storage.search(Place, "wifi OR beach")),
+                         sorted(self.keys(self.flat, self.cabin)))
+        self.assertEqual(self.storage.search(Place, "pool beach"), {})
+        self.assertEqual(self.storage.search(Place, "castle"), {})
+
+    def test_ranked(self):
+        self.assertEqual(list(self.storage.search(Place, "pool")),
+                         self.keys(self.pool, self.flat))
+        self.assertEqual(list(self.storage.search(Place, "pool", limit=1)),
+                         self.keys(self.pool))
+        self.assertEqual(len(self.storage.search(None, "pool")), 3)
+
+    def test_index_follows_changes(self):
+        self.storage.search(Place, "pool")
+        self.cabin.description = "Cabin with a pool"
+        self.assertIn(self.keys(self.cabin)[0],
+                      self.storage.search(Place, "pool"))
+        self.assertEqual(self.storage.search(Place, "beach"), {})
+        self.storage.delete(self.flat)
+        self.assertEqual(self.storage.search(Place, "wifi"), {})
+
+    def test_saved_postings(self):
+        self.storage.search(Place, "pool")
+        self.assertTrue(os.path.isfile(self.storage.search_path()))
+        self.storage.reset(self.path)
+        self.storage.enable_lazy()
+        self.storage.reload()
+        found = self.storage.search(Place, "wifi")
+        self.assertEqual(list(found), self.keys(self.flat))
+        # Only the match was read from the snapshot
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         self.keys(self.flat))
+
+    def test_stale_postings(self):
+        self.storage.search(Place, "pool")
+        FileStorage._FileStorage__texts = None
+        self.cabin.description = "Cabin with wifi"
+        self.storage.save()
+        self.storage.reset(self.path)
+        self.storage.reload()
+        self.assertEqual(sorted(self.storage.search(Place, "wifi")),
+                         sorted(self.keys(self.flat, self.cabin)))
+
+
+class TestFileStorageSelect(unittest.TestCase):
+    def setUp(self):
+        """Start from a few places in a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.storage = FileStorage()
+        self.storage.reset(os.path.join(self.tmpdir, "file.json"))
+        self.places = []
+        for price, guests in ((40, 2), (80, 6), (150, 8), (120, 6)):
+            place = Place()
+            place.price_by_night = price
+            place.max_guest = guests
+            self.places.append(place)
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def keys(self, *indexes):
+        """Returns the storage keys of the places at indexes."""
+        return ["Place." + self.places[index].id for index in indexes]
+
+    def test_range(self):
+        self.assertEqual(
+            list(self.storage.select(Place, price_by_night=(50, 120))),
+            self.keys(1, 3))
+        self.assertEqual(
+            sorted(self.storage.select(Place, max_guest=(6, None),
+                                       price_by_night=(None, 130))),
+            sorted(self.keys(1, 3)))
+
+    def test_order_by(self):
+        self.assertEqual(
+            list(self.storage.select(Place, order_by="-price_by_night")),
+            self.keys(2, 3, 1, 0))
+        self.assertEqual(
+            list(self.storage.select(Place, max_guest=(6, None),
+                                     order_by="price_by_night",
+                                     limit=2, offset=1)),
+            self.keys(3, 2))
+
+    def test_index_follows_changes(self):
+        self.storage.select(Place, order_by="updated_at")
+        self.places[0].save()
+        self.assertEqual(
+            list(self.storage.select(Place, order_by="-updated_at",
+                                     limit=1)),
+            self.keys(0))
+        self.places[2].price_by_night = 10
+        self.storage.delete(self.places[0])
+        self.assertEqual(
+            list(self.storage.select(Place, order_by="price_by_night")),
+            self.keys(2, 1, 3))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.storage.select(Place, name=("a", "b"))
+        with self.assertRaises(ValueError):
+            self.storage.select(Place, updated_at=(1, None))
+
+
+class TestFileStorageRefresh(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file holding one user."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        self.storage = FileStorage()
+        self.storage.reset(self.path)
+        self.user = User()
+        self.user.first_name = "Betty"
+        self.storage.save()
+
+    def tearDown(self):
+        """Restore the default storage settings."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_refresh(self):
+        self.assertFalse(self.storage.refresh())
+        generation = self.storage.generation()
+        # Another process renames the user and adds a city
+        with open(self.path) as file:
+            records = json.load(file)
+        key = "User." + self.user.id
+        records[key]["first_name"] = "Holberton"
+        records["City.1"] = dict(records[key], __class__="City", id="1")
+        with open(self.path, "w") as file:
+            json.dump(records, file)
+
+        self.assertTrue(self.storage.refresh())
+        self.assertNotEqual(self.storage.generation(), generation)
+        self.assertEqual(self.storage.get(User, self.user.id).first_name,
+                         "Holberton")
+        self.assertIsNotNone(self.storage.get(City, "1"))
+        self.assertFalse(self.storage.refresh())
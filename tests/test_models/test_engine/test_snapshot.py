@@ -0,0 +1,96 @@
+"""Module: test_snapshot.py"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from models.engine import snapshot
+from models.engine.file_storage import FileStorage
+from models.user import User
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        """Set up test methods."""
+        self.records = {
+            "User.1": {"id": "1", "created_at": "2024-06-30T09:39:38.071064",
+                       "updated_at": "2024-06-30T09:39:38",
+                       "email": "a@b.c", "__class__": "User"},
+            "User.2": {"id": "2", "created_at": "2024-06-30T09:39:38.071064",
+                       "updated_at": "2024-06-30 09:39:38.071064",
+                       "tags": ["x", {"y": None}], "__class__": "User"},
+            "Custom.key": {"id": "3", "created_at": 5, "updated_at": None,
+                           "__class__": "State"},
+        }
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        for format in snapshot.FORMATS:
+            data = snapshot.dumps(self.records, format)
+            self.assertEqual(snapshot.loads(data), self.records)
+
+    def test_columnar_is_smaller(self):
+        records = {}
+        for number in range(100):
+            key = "User.{}".format(number)
+            records[key] = dict(self.records["User.1"], id=str(number))
+        self.assertLess(len(snapshot.dumps(records, "columnar")) * 5,
+                        len(snapshot.dumps(records, "json")))
+
+    def test_indexed_lookup(self):
+        records = {"User.{}".format(number): {"id": str(number)}
+                   for number in range(50)}
+        data = snapshot.dumps(records, "indexed")
+        for key, record in records.items():
+            self.assertEqual(snapshot.lookup(data, key), record)
+        self.assertIsNone(snapshot.lookup(data, "User.50"))
+        self.assertIsNone(
+            snapshot.lookup(snapshot.dumps({}, "indexed"), "User.0"))
+
+    def test_convert(self):
+        source = os.path.join(self.tmpdir, "file.json")
+        packed = os.path.join(self.tmpdir, "file.hbnb")
+        back = os.path.join(self.tmpdir, "back.json")
+        with open(source, "w") as file:
+            json.dump(self.records, file, indent=4)
+        snapshot.convert(source, packed, "columnar")
+        snapshot.convert(packed, back, "json")
+        with open(back) as file:
+            self.assertEqual(json.load(file), self.records)
+
+    def test_split_and_join(self):
+        source = os.path.join(self.tmpdir, "file.json")
+        shards = os.path.join(self.tmpdir, "file.json.d")
+        back = os.path.join(self.tmpdir, "back.json")
+        with open(source, "w") as file:
+            json.dump(self.records, file, indent=4)
+        snapshot.split(source, shards, "columnar")
+        self.assertEqual(sorted(os.listdir(shards)),
+                         ["Custom.json", "User.json"])
+        snapshot.join(shards, back)
+        with open(back) as file:
+            self.assertEqual(json.load(file), self.records)
+
+    def test_storage_columnar(self):
+        storage = FileStorage()
+        path = os.path.join(self.tmpdir, "file.json")
+        storage.reset(path)
+        try:
+            storage.set_format("columnar")
+            user = User()
+            user.email = "betty@hbnb.io"
+            storage.save()
+            storage.reset(path)
+            storage.reload()
+            loaded = storage.all()["User." + user.id]
+            self.assertEqual(loaded.to_dict(), user.to_dict())
+        finally:
+            storage.reset()
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            FileStorage().set_format("yaml")
@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+import models
+from models.user import User
+from models.place import Place
+from models.engine.sqlite_storage import SQLiteStorage
+import os
+import shutil
+import sqlite3
+import tempfile
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        """Use a scratch database as the models' storage."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.db")
+        self.storage = SQLiteStorage()
+        self.storage.reset(self.path)
+        self.storage.reload()
+        patcher = patch.object(models, "storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Close the scratch database."""
+        self.storage.reset()
+        shutil.rmtree(self.tmpdir)
+
+    def rows(self, table):
+        """Returns the ids stored in a table of the scratch database."""
+        connection = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in connection.execute(
+                'SELECT id FROM "{}" ORDER BY rowid'.format(table))]
+        finally:
+            connection.close()
+
+    def test_save_writes_rows(self):
+        user = User()
+        self.assertEqual(self.rows("User"), [])
+        self.assertIn("User." + user.id, self.storage.all(User))
+        user.save()
+        self.assertEqual(self.rows("User"), [user.id])
+
+    def test_reload_reads_rows_on_demand(self):
+        user = User()
+        user.first_name = "Betty"
+        user.save()
+        self.storage.reload()
+        copy = self.storage.get(User, user.id)
+        self.assertIsNot(copy, user)
+        self.assertEqual(copy.to_dict(), user.to_dict())
+        self.assertEqual(self.storage.count(User), 1)
+        self.assertEqual(list(self.storage.all()), ["User." + user.id])
+
+    def test_filter_uses_indexed_columns(self):
+        first, second = Place(), Place()
+        first.city_id = "c1"
+        second.city_id = "c2"
+        first.save()
+        self.storage.reload()
+        found = self.storage.filter(Place, city_id="c1")
+        self.assertEqual(list(found), ["Place." + first.id])
+        self.assertEqual(self.storage.filter(Place, city_id="c1",
+                                             name="nowhere"), {})
+
+    def test_delete(self):
+        user = User()
+        user.save()
+        self.storage.delete(user)
+        self.assertIsNone(self.storage.get(User, user.id))
+        self.storage.save()
+        self.assertEqual(self.rows("User"), [])
+
+    def test_bulk_methods(self):
+        users = self.storage.create_many(
+            User, [{"first_name": "Betty"}, {"first_name": "Bob"}])
+        self.assertEqual(len(self.rows("User")), 2)
+        self.assertEqual(self.storage.update_many(
+            User, {users[0].id: {"last_name": "Holberton"}}), 1)
+        self.storage.reload()
+        self.assertEqual(
+            self.storage.get(User, users[0].id).last_name, "Holberton")
+        self.assertEqual(self.storage.destroy_many(
+            User, [user.id for user in users]), 2)
+        self.assertEqual(self.rows("User"), [])
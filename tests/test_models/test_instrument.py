@@ -0,0 +1,54 @@
+"""Module: test_instrument.py"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from models import instrument
+from models.base_model import BaseModel
+from models.engine.file_storage import FileStorage
+from models.user import User
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        """Point the storage at a scratch file."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.json")
+        FileStorage().reset(self.path)
+        instrument.stats.reset()
+
+    def tearDown(self):
+        """Turn instrumentation off and restore the storage."""
+        instrument.disable()
+        FileStorage().reset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(instrument.enabled())
+        save = FileStorage.save
+        instrument.enable()
+        self.assertIsNot(FileStorage.save, save)
+        instrument.disable()
+        self.assertIs(FileStorage.save, save)
+        self.assertFalse(hasattr(BaseModel.to_dict, "__wrapped__"))
+
+    def test_counters(self):
+        instrument.enable()
+        User().save()
+        counters = instrument.stats.counters
+        self.assertEqual(counters["BaseModel.__init__"][0], 1)
+        self.assertEqual(counters["FileStorage.save"][0], 1)
+        written = os.path.getsize(self.path)
+        self.assertEqual(counters["FileStorage.write"][2], written)
+        self.assertIn("FileStorage.save", instrument.stats.report())
+
+    def test_trace_file(self):
+        path = os.path.join(self.tmpdir, "trace.jsonl")
+        instrument.enable(instrument.TraceFile(path))
+        User()
+        instrument.disable()
+        with open(path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertIn("BaseModel.__init__",
+                      [record["name"] for record in records])
@@ -0,0 +1,61 @@
+"""Module: test_timestamps.py"""
+import unittest
+from datetime import datetime
+from models import timestamps
+from models.base_model import BaseModel
+
+
+class TestTimestamps(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(timestamps.parse("2024-06-30T09:39:38.071064"),
+                         datetime(2024, 6, 30, 9, 39, 38, 71064))
+        self.assertEqual(timestamps.parse("2024-06-30T09:39:38"),
+                         datetime(2024, 6, 30, 9, 39, 38))
+
+    def test_parse_is_cached(self):
+        first = timestamps.parse("2024-06-30T09:39:38.000001")
+        self.assertIs(timestamps.parse("2024-06-30T09:39:38.000001"), first)
+
+    def test_invalid(self):
+        for value in ("2023-01-01 12:00:00", "2023-01-01", "",
+                      "2023-01-01T12:00:00+01:00", 12,
+                      "2024-13-45T99:99:99.000000", "2024-02-31T10:00:00",
+                      "2024-W26-7T09:39:38", "2024-06-30T09:39:38.07106Z",
+                      "2024-06-30T09:39:38.0710+1"):
+            with self.assertRaises(ValueError):
+                timestamps.check(value)
+
+    def test_round_trip(self):
+        for moment in (datetime(2024, 1, 2, 3, 4, 5),
+                       datetime(2024, 1, 2, 3, 4, 5, 6)):
+            self.assertEqual(
+                timestamps.parse(timestamps.format(moment)), moment)
+
+
+class TestLazyTimestamps(unittest.TestCase):
+    def setUp(self):
+        """Load a model from a dictionary."""
+        self.model = BaseModel(id="1",
+                               created_at="2024-06-30T09:39:38",
+                               updated_at="2024-06-30T09:39:38.071064")
+
+    def test_impossible_date(self):
+        with self.assertRaises(ValueError):
+            BaseModel(id="1", created_at="2024-02-31T10:00:00",
+                      updated_at="2024-06-30T09:39:38")
+
+    def test_unparsed_until_read(self):
+        self.assertIsInstance(self.model.__dict__["created_at"], str)
+        self.assertEqual(self.model.created_at,
+                         datetime(2024, 6, 30, 9, 39, 38))
+        self.assertIsInstance(self.model.__dict__["created_at"], datetime)
+
+    def test_to_dict_keeps_strings(self):
+        serialized = self.model.to_dict()
+        self.assertEqual(serialized["created_at"], "2024-06-30T09:39:38")
+        self.assertEqual(serialized["updated_at"],
+                         "2024-06-30T09:39:38.071064")
+
+    def test_str_shows_datetimes(self):
+        self.assertIn("datetime.datetime(2024, 6, 30, 9, 39, 38)",
+                      str(self.model))